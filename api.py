@@ -0,0 +1,125 @@
+import asyncio
+import datetime
+import os
+import uuid
+from fastapi import APIRouter, HTTPException, Header, Depends
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse, PlainTextResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+
+from config import SCANNER_API_KEY, REPORTS_API_KEY
+from reports import EXPORTS, EXPORT_FORMATS, iter_csv, export_file, valid_export_link
+from checkin_cache import today_date, Visitor
+import scans
+import edge
+from visitors import service
+from metrics import registry, timed
+from startup import startup
+
+router = APIRouter()
+
+def _date(value, name):
+    if not value:
+        return today_date()
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(400, f"{name} must be a YYYY-MM-DD date")
+
+# --- Report downloads: /exports/visits.csv?start=2025-01-01&end=2025-01-31 ---
+# Exports carry visitor details: BI tools send X-API-Key, the Admin page opens a signed link
+def require_export_access(name: str, fmt: str, start: str = "", end: str = "", expires: str = "", signature: str = "", x_api_key: str = Header(default="")):
+    if REPORTS_API_KEY and x_api_key == REPORTS_API_KEY:
+        return
+    if not valid_export_link(name, fmt, start, end, expires, signature):
+        raise HTTPException(401, "Invalid API key or expired link")
+
+@router.get("/exports/{name}.{fmt}", dependencies=[Depends(require_export_access)])
+async def download_export(name: str, fmt: str, start: str = "", end: str = ""):
+    if name not in EXPORTS or fmt not in EXPORT_FORMATS:
+        raise HTTPException(404, "Unknown export")
+    start_date, end_date = _date(start, "start"), _date(end, "end")
+    if end_date < start_date:
+        raise HTTPException(400, "end is before start")
+    filename = f"{name}_{start_date.isoformat()}_{end_date.isoformat()}.{fmt}"
+
+    if fmt == "csv":
+        return StreamingResponse(iter_csv(name, start_date, end_date), media_type="text/csv", headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+    try:
+        path = await asyncio.to_thread(export_file, name, fmt, start_date, end_date)
+    except ValueError as ex:
+        raise HTTPException(501, str(ex))
+    return FileResponse(path, filename=filename, media_type="application/vnd.apache.parquet", background=BackgroundTask(os.remove, path))
+
+# --- Scanner / turnstile API ---
+class Scan(BaseModel):
+    qr_id: str
+
+SCAN_STATUS_CODES = {scans.OK: 200, scans.NOT_FOUND: 404, scans.WRONG_DATE: 409}
+
+def require_scanner_key(x_api_key: str = Header(default="")):
+    if SCANNER_API_KEY and x_api_key != SCANNER_API_KEY:
+        raise HTTPException(401, "Invalid API key")
+
+# Scanners retry on 503, as they do when the server is unreachable; edge mode scans against its local replica
+def require_ready():
+    if edge.replica is None and not startup.ready.is_set():
+        raise HTTPException(503, "Starting, database not ready", headers={"Retry-After": "1"})
+
+def _scan_response(result):
+    body = {"status": result.status, "allowed": result.status == scans.OK}
+    if result.visitor is not None:
+        body.update(
+            name=result.visitor.name, surname=result.visitor.surname, company_name=result.visitor.company_name,
+            host=result.visitor.host, visitors_count=result.visitor.visitors_count, visit_date=result.visitor.visit_date.isoformat(),
+        )
+    if result.time is not None:
+        body["time"] = result.time.isoformat()
+    return JSONResponse(body, status_code=SCAN_STATUS_CODES[result.status])
+
+@router.post("/api/scans/validate", dependencies=[Depends(require_scanner_key), Depends(require_ready)])
+@timed("api_validate")
+async def validate_scan(scan: Scan):
+    return _scan_response(await service.validate(scan.qr_id))
+
+@router.post("/api/scans/check-in", dependencies=[Depends(require_scanner_key), Depends(require_ready)])
+@timed("api_check_in")
+async def check_in_scan(scan: Scan):
+    return _scan_response(await service.check_in(scan.qr_id))
+
+@router.post("/api/scans/check-out", dependencies=[Depends(require_scanner_key), Depends(require_ready)])
+@timed("api_check_out")
+async def check_out_scan(scan: Scan):
+    return _scan_response(await service.check_out(scan.qr_id))
+
+# --- Registration by kiosks and host systems, same rules as the registration page ---
+class Registration(BaseModel):
+    name: str
+    surname: str
+    company_name: str
+    host: str
+    visitors_count: int
+    visit_date: str = ""
+
+@router.post("/api/visitors", status_code=201, dependencies=[Depends(require_scanner_key), Depends(require_ready)])
+@timed("api_register")
+async def register_visitor(registration: Registration):
+    if not all([registration.name, registration.surname, registration.company_name, registration.host]) or registration.visitors_count < 1:
+        raise HTTPException(422, "Please fill all data")
+    visitor = Visitor(
+        str(uuid.uuid4()), _date(registration.visit_date, "visit_date"), registration.host, registration.visitors_count,
+        registration.name, registration.surname, registration.company_name,
+    )
+    await service.register(visitor)
+    return {"qr_id": visitor.qr_id, "visit_date": visitor.visit_date.isoformat()}
+
+# --- Prometheus scrape endpoint ---
+@router.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+# --- Liveness/readiness: 200 once the database is reachable and the schema prepared, 503 before ---
+@router.get("/health")
+def health():
+    body = startup.health()
+    return JSONResponse(body, status_code=200 if startup.ready.is_set() else 503)
@@ -0,0 +1,44 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from database import Base, engine, SessionLocal, Registered
+from common import percentile, seed_visitors
+from checkin_cache import today_index
+
+ROWS = int(os.getenv("BENCH_ROWS", "100000"))
+SCANS = int(os.getenv("BENCH_SCANS", "5000"))
+
+def db_lookup(qr_id):
+    db = SessionLocal()
+    try:
+        return db.query(Registered).filter(Registered.qr_id == qr_id).first()
+    finally:
+        db.close()
+
+def measure(label, func, scans):
+    latencies = []
+    for qr_id in scans:
+        t0 = time.perf_counter()
+        func(qr_id)
+        latencies.append(time.perf_counter() - t0)
+    print(f"{label:<14} p50 {percentile(latencies, 50) * 1e6:9.1f} us   p99 {percentile(latencies, 99) * 1e6:9.1f} us")
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    qr_ids = seed_visitors(ROWS, today_every=10)
+    scans = [random.choice(qr_ids) for _ in range(SCANS)]
+    measure("ORM query", db_lookup, scans)
+    t0 = time.perf_counter()
+    today_index.lookup(scans[0])
+    print(f"index preload  {(time.perf_counter() - t0) * 1000:.1f} ms")
+    measure("today index", today_index.lookup, scans)
+    print(today_index.stats())
+
+if __name__ == "__main__":
+    main()
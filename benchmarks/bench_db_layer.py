@@ -0,0 +1,82 @@
+import asyncio
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from sqlalchemy import select
+from config import TARGET_TIMEZONE
+from database import Base, engine, async_engine, SessionLocal, AsyncSessionLocal, Registered, CheckIn
+from common import percentile, seed_visitors
+
+ROWS = int(os.getenv("BENCH_ROWS", "20000"))
+SESSIONS = int(os.getenv("BENCH_SESSIONS", "50"))
+SCANS_PER_SESSION = int(os.getenv("BENCH_SCANS_PER_SESSION", "40"))
+
+# One simulated check-in: look the visitor up, then record the scan
+def sync_check_in(qr_id):
+    db = SessionLocal()
+    try:
+        if db.execute(select(Registered.id).where(Registered.qr_id == qr_id)).first():
+            db.add(CheckIn(qr_id=qr_id, check_in_time=datetime.datetime.now(TARGET_TIMEZONE)))
+            db.commit()
+    finally:
+        db.close()
+
+async def async_check_in(qr_id):
+    async with AsyncSessionLocal() as db:
+        if (await db.execute(select(Registered.id).where(Registered.qr_id == qr_id))).first():
+            db.add(CheckIn(qr_id=qr_id, check_in_time=datetime.datetime.now(TARGET_TIMEZONE)))
+            await db.commit()
+
+def report(label, latencies, elapsed):
+    print(
+        f"{label:<24} {len(latencies) / elapsed:8.0f} scans/s   "
+        f"p50 {percentile(latencies, 50) * 1000:7.2f} ms   p99 {percentile(latencies, 99) * 1000:7.2f} ms"
+    )
+
+def run_sync(sessions):
+    latencies = []
+
+    def session(scans):
+        for qr_id in scans:
+            t0 = time.perf_counter()
+            sync_check_in(qr_id)
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    # Flet runs sync handlers on a thread pool, one thread per concurrent event
+    with ThreadPoolExecutor(max_workers=len(sessions)) as pool:
+        list(pool.map(session, sessions))
+    report(f"sync, {len(sessions)} threads", latencies, time.perf_counter() - t0)
+
+async def run_async(sessions):
+    latencies = []
+
+    async def session(scans):
+        for qr_id in scans:
+            t0 = time.perf_counter()
+            await async_check_in(qr_id)
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(session(scans) for scans in sessions))
+    report(f"async, {len(sessions)} tasks", latencies, time.perf_counter() - t0)
+    await async_engine.dispose()
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    qr_ids = seed_visitors(ROWS)
+    print(f"{engine.dialect.name}: {SESSIONS} sessions x {SCANS_PER_SESSION} check-ins")
+    sessions = [[random.choice(qr_ids) for _ in range(SCANS_PER_SESSION)] for _ in range(SESSIONS)]
+    run_sync(sessions)
+    asyncio.run(run_async(sessions))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from events import bus, CARD_ISSUED
+
+SESSIONS = int(os.getenv("BENCH_SESSIONS", "50"))
+EVENTS = int(os.getenv("BENCH_EVENTS", "1000"))
+
+# Each simulated reception page keeps its own card list and applies events as diffs
+class Session:
+    def __init__(self):
+        self.cards = []
+        self.done = threading.Event()
+        self.unsubscribe = bus.subscribe(self.on_event)
+
+    def on_event(self, event):
+        if event["topic"] == CARD_ISSUED:
+            self.cards.insert(0, f"{event['issue_time']} / {event['phone_number']} / {event['card_number']}")
+            if len(self.cards) == EVENTS:
+                self.done.set()
+
+def main():
+    bus.start()
+    sessions = [Session() for _ in range(SESSIONS)]
+    started = time.perf_counter()
+    for i in range(EVENTS):
+        bus.publish(CARD_ISSUED, qr_id=str(i), phone_number="+000", card_number=str(i), issue_time="2025-01-01T10:00:00+03:00")
+    publish_time = time.perf_counter() - started
+    for session in sessions:
+        if not session.done.wait(30):
+            sys.exit(f"a session received {len(session.cards)} of {EVENTS} events")
+    elapsed = time.perf_counter() - started
+    for session in sessions:
+        session.unsubscribe()
+
+    print(f"sessions:              {SESSIONS}")
+    print(f"events:                {EVENTS}")
+    print(f"publish (us/event):    {publish_time / EVENTS * 1e6:.1f}")
+    print(f"deliveries/s:          {SESSIONS * EVENTS / elapsed:.0f}")
+    print(f"all sessions in sync:  {all(s.cards == sessions[0].cards for s in sessions)}")
+
+if __name__ == "__main__":
+    main()
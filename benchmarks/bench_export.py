@@ -0,0 +1,73 @@
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from sqlalchemy import insert
+from config import TARGET_TIMEZONE
+from database import Base, engine, Registered, CheckIn, CheckOut
+from reports import export_file, update_rollups
+
+ROWS = int(os.getenv("BENCH_ROWS", "200000"))
+DAYS = int(os.getenv("BENCH_DAYS", "30"))
+HOSTS = ["Reception", "IT", "Finance", "Sales", "Legal"]
+COMPANIES = ["ACME", "Globex", "Initech", "Umbrella", "Hooli"]
+
+def seed():
+    today = datetime.datetime.now(TARGET_TIMEZONE).replace(hour=9, minute=0, second=0, microsecond=0)
+    with engine.begin() as conn:
+        for offset in range(0, ROWS, 10000):
+            visitors, check_ins, check_outs = [], [], []
+            for i in range(offset, min(offset + 10000, ROWS)):
+                qr_id = str(uuid.uuid4())
+                arrival = today - datetime.timedelta(days=i % DAYS) + datetime.timedelta(minutes=random.randint(0, 480))
+                visitors.append({"qr_id": qr_id, "name": "N", "surname": "S", "company_name": random.choice(COMPANIES), "visitors_count": 1, "host": random.choice(HOSTS), "visit_date": arrival.date()})
+                check_ins.append({"qr_id": qr_id, "check_in_time": arrival})
+                check_outs.append({"qr_id": qr_id, "check_out_time": arrival + datetime.timedelta(minutes=random.randint(10, 240))})
+            conn.execute(insert(Registered), visitors)
+            conn.execute(insert(CheckIn), check_ins)
+            conn.execute(insert(CheckOut), check_outs)
+
+def measure(func):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    if ROWS:
+        seed()
+    t0 = time.perf_counter()
+    update_rollups()
+    print(f"{engine.dialect.name}: {ROWS} visits over {DAYS} days, daily rollup built in {time.perf_counter() - t0:.2f} s")
+    t0 = time.perf_counter()
+    update_rollups()
+    print(f"incremental rollup (today only)    {(time.perf_counter() - t0) * 1000:8.1f} ms")
+
+    end = datetime.datetime.now(TARGET_TIMEZONE).date()
+    start = end - datetime.timedelta(days=DAYS)
+    for name, rows in [("visits", ROWS), ("occupancy", ROWS * 2), ("daily", None)]:
+        for fmt in ("csv", "parquet"):
+            try:
+                path, elapsed, peak = measure(lambda: export_file(name, fmt, start, end))
+            except ValueError as ex:
+                print(f"{name}.{fmt}: {ex}")
+                continue
+            size = os.path.getsize(path)
+            os.remove(path)
+            rate = f"{rows / elapsed:9.0f} rows/s" if rows else " " * 15
+            print(f"{name + '.' + fmt:<18} {elapsed:6.2f} s  {rate}  {size / 1e6:7.1f} MB  peak {peak / 1e6:6.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import csv
+import datetime
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from database import Base, engine, SessionLocal, Registered
+from importer import import_visitors
+
+ROWS = int(os.getenv("BENCH_ROWS", "10000"))
+ORM_ROWS = int(os.getenv("BENCH_ORM_ROWS", "1000"))
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "surname", "company", "visitors", "host", "date"])
+        for i in range(rows):
+            writer.writerow([f"Name{i}", f"Surname{i}", "ACME", 1, "Host", "01.01.2025"])
+
+# One Registered row and one commit per visitor, as the registration form does it
+def orm_per_row(rows):
+    for i in range(rows):
+        db = SessionLocal()
+        try:
+            db.add(Registered(qr_id=str(uuid.uuid4()), name=f"Name{i}", surname=f"Surname{i}", company_name="ACME", visitors_count=1, host="Host", visit_date=datetime.date(2025, 1, 1)))
+            db.commit()
+        finally:
+            db.close()
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    path = os.path.join(tempfile.mkdtemp(), "visitors.csv")
+    write_csv(path, ROWS)
+
+    started = time.perf_counter()
+    orm_per_row(ORM_ROWS)
+    orm_rate = ORM_ROWS / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    result = import_visitors(path, send_emails=False)
+    bulk_rate = result["imported"] / (time.perf_counter() - started)
+
+    print(f"database:            {engine.dialect.name}+{engine.dialect.driver}")
+    print(f"per-row ORM rows/s:  {orm_rate:10.1f}  ({ORM_ROWS} rows)")
+    print(f"bulk import rows/s:  {bulk_rate:10.1f}  ({result['imported']} rows)")
+    print(f"speedup:             {bulk_rate / orm_rate:10.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from smtp_sink import SmtpSink
+
+sink = SmtpSink().start()
+# Seeding millions of rows takes a while, so the SQLite file is kept between runs
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'visitors-lifecycle.db')}")
+os.environ.update(SMTP_SERVER="127.0.0.1", SMTP_PORT=str(sink.port), SMTP_STARTTLS="0", SMTP_USER="", SMTP_FROM="bench@example.com")
+
+from sqlalchemy import insert, select, delete, func
+from config import TARGET_TIMEZONE
+from database import engine, async_engine, Registered, CheckIn, CheckOut, AccessCard
+from common import percentile
+from checkin_cache import Visitor, today_date
+from mailer import mailer, EmailOutbox
+import partitions
+import scans
+import startup
+from visitors import service
+
+SEED_VISITORS = int(os.getenv("BENCH_SEED_VISITORS", "1000000"))
+SEED_DAYS = int(os.getenv("BENCH_SEED_DAYS", "365"))
+SEED_CHUNK = int(os.getenv("BENCH_SEED_CHUNK", "50000"))
+LIFECYCLES = int(os.getenv("BENCH_LIFECYCLES", "2000"))
+DESKS = int(os.getenv("BENCH_DESKS", "20"))
+HISTORY = os.getenv("BENCH_HISTORY", os.path.join(ROOT, "benchmarks", "results", "lifecycle.json"))
+TOLERANCE = float(os.getenv("BENCH_TOLERANCE", "0.20"))  # relative change reported as a regression
+CHECK = os.getenv("BENCH_CHECK", "0") == "1"  # exit with 1 on a regression
+
+STEPS = ("register", "email", "check_in", "card", "check_out")
+
+def _log(message):
+    print(f"[lifecycle] {message}", flush=True)
+
+# --- Synthetic history: registrations over SEED_DAYS days, most checked in and out, some with cards ---
+def seed_rows(rng, first_day, count):
+    registered, check_ins, check_outs, cards = [], [], [], []
+    for _ in range(count):
+        qr_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        day = first_day + datetime.timedelta(days=rng.randrange(SEED_DAYS))
+        arrival = datetime.datetime.combine(day, datetime.time(8), TARGET_TIMEZONE) + datetime.timedelta(minutes=rng.randrange(480))
+        registered.append({
+            "qr_id": qr_id, "name": f"Name{rng.randrange(5000)}", "surname": f"Surname{rng.randrange(20000)}",
+            "company_name": f"Company {rng.randrange(2000)}", "visitors_count": rng.randint(1, 4), "host": f"Host {rng.randrange(300)}",
+            "visit_date": day, "registration_time": arrival - datetime.timedelta(days=rng.randrange(14), minutes=rng.randrange(600)),
+        })
+        if rng.random() < 0.85:
+            check_ins.append({"qr_id": qr_id, "check_in_time": arrival})
+            if rng.random() < 0.9:
+                check_outs.append({"qr_id": qr_id, "check_out_time": arrival + datetime.timedelta(minutes=rng.randint(15, 480))})
+            if rng.random() < 0.3:
+                cards.append({"qr_id": qr_id, "phone_number": f"+{rng.randrange(10**9, 10**10)}", "card_number": str(rng.randrange(10**6)), "issue_time": arrival})
+    return registered, check_ins, check_outs, cards
+
+def seed():
+    # A database kept from an earlier version needs the current migrations too
+    startup.prepare_schema()
+    with engine.begin() as conn:
+        # Messages left over from an earlier run would be counted as this run's deliveries
+        conn.execute(delete(EmailOutbox))
+        existing = conn.execute(select(func.count()).select_from(Registered)).scalar()
+    if existing >= SEED_VISITORS:
+        _log(f"reusing the {existing} visitors already in the database")
+        return existing
+
+    first_day = today_date() - datetime.timedelta(days=SEED_DAYS)
+    if partitions.enabled():
+        with engine.begin() as conn:
+            month = partitions._month_start(first_day)
+            while month <= partitions._month_start(today_date()):
+                for table in partitions.PARTITIONED_TABLES:
+                    partitions._create_partition(conn, table, month)
+                month = partitions._add_months(month, 1)
+
+    # Same seed for the same target size, so runs compare like with like
+    rng = random.Random(SEED_VISITORS + existing)
+    started = time.perf_counter()
+    remaining = SEED_VISITORS - existing
+    while remaining > 0:
+        chunk = min(SEED_CHUNK, remaining)
+        registered, check_ins, check_outs, cards = seed_rows(rng, first_day, chunk)
+        with engine.begin() as conn:
+            for model, rows in ((Registered, registered), (CheckIn, check_ins), (CheckOut, check_outs), (AccessCard, cards)):
+                if rows:
+                    conn.execute(insert(model), rows)
+        remaining -= chunk
+        _log(f"seeded {SEED_VISITORS - remaining}/{SEED_VISITORS} visitors")
+    _log(f"seeding took {time.perf_counter() - started:.1f}s")
+    return SEED_VISITORS
+
+# --- One visitor from registration to leaving, through the same functions the page uses ---
+async def lifecycle(rng, latencies):
+    async def step(name, call):
+        t0 = time.perf_counter()
+        result = await call
+        latencies[name].append(time.perf_counter() - t0)
+        return result
+
+    visitor = Visitor(
+        str(uuid.uuid4()), today_date(), f"Host {rng.randrange(300)}", rng.randint(1, 4),
+        f"Name{rng.randrange(5000)}", f"Surname{rng.randrange(20000)}", f"Company {rng.randrange(2000)}",
+    )
+    await step("register", service.register(visitor))
+    # send_pass is sync, the page runs it on Flet's handler thread pool
+    await step("email", asyncio.to_thread(service.send_pass, f"{visitor.qr_id}@example.com", visitor.qr_id))
+    result = await step("check_in", service.check_in(visitor.qr_id))
+    assert result.status == scans.OK, result
+    assert await step("card", service.issue_card(visitor.qr_id, "+000", str(rng.randrange(10**6))))
+    result = await step("check_out", service.check_out(visitor.qr_id))
+    assert result.status == scans.OK, result
+
+async def drive():
+    latencies = {name: [] for name in STEPS}
+    remaining = iter(range(LIFECYCLES))
+
+    async def desk(number):
+        rng = random.Random(number)
+        for _ in remaining:
+            await lifecycle(rng, latencies)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(desk(i) for i in range(DESKS)))
+    elapsed = time.perf_counter() - started
+    await async_engine.dispose()
+    return latencies, elapsed
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# --- JSON history: one entry per run, compared with the last run on the same setup ---
+def load_history():
+    if not os.path.exists(HISTORY):
+        return []
+    with open(HISTORY) as f:
+        return json.load(f)
+
+def save_history(history):
+    os.makedirs(os.path.dirname(HISTORY), exist_ok=True)
+    with open(HISTORY, "w") as f:
+        json.dump(history, f, indent=2)
+
+def compare(previous, current):
+    regressions = []
+    pairs = [("lifecycles_per_s", previous["lifecycles_per_s"], current["lifecycles_per_s"], True)]
+    for name in STEPS:
+        for p in ("p50_ms", "p95_ms", "p99_ms"):
+            pairs.append((f"{name} {p}", previous["steps"][name][p], current["steps"][name][p], False))
+    print(f"\ncompared with {previous['commit']} from {previous['time']}:")
+    for label, before, after, higher_is_better in pairs:
+        change = (after - before) / before if before else 0.0
+        worse = -change if higher_is_better else change
+        flag = "  REGRESSION" if worse > TOLERANCE else ""
+        if flag:
+            regressions.append(label)
+        print(f"  {label:<22} {before:10.2f} -> {after:10.2f}  {change * 100:+6.1f} %{flag}")
+    return regressions
+
+def main():
+    registered = seed()
+    mailer.start()
+    started = time.perf_counter()
+    latencies, elapsed = asyncio.run(drive())
+    # Passes are rendered and sent by the mail workers after the page has moved on
+    while sink.received < LIFECYCLES and time.perf_counter() - started < elapsed + 120:
+        time.sleep(0.05)
+    mail_elapsed = time.perf_counter() - started
+    mailer.stop()
+
+    run = {
+        "time": datetime.datetime.now(TARGET_TIMEZONE).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "setup": {
+            "dialect": engine.dialect.name, "seed_visitors": SEED_VISITORS, "lifecycles": LIFECYCLES, "desks": DESKS,
+            "python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+        },
+        "registered_visitors": registered,
+        "lifecycles_per_s": LIFECYCLES / elapsed,
+        "emails_delivered": sink.received,
+        "emails_per_s": sink.received / mail_elapsed,
+        "steps": {
+            name: {
+                "p50_ms": percentile(values, 50) * 1000, "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000, "mean_ms": sum(values) / len(values) * 1000,
+            }
+            for name, values in latencies.items()
+        },
+    }
+
+    print(f"{engine.dialect.name}, {registered} registered visitors: {LIFECYCLES} lifecycles from {DESKS} desks in {elapsed:.2f}s")
+    print(f"lifecycles/s {run['lifecycles_per_s']:.1f}   emails delivered {sink.received} ({run['emails_per_s']:.1f}/s)")
+    for name, stats in run["steps"].items():
+        print(f"  {name:<10} p50 {stats['p50_ms']:7.2f} ms   p95 {stats['p95_ms']:7.2f} ms   p99 {stats['p99_ms']:7.2f} ms")
+
+    history = load_history()
+    previous = next((entry for entry in reversed(history) if entry["setup"] == run["setup"]), None)
+    regressions = compare(previous, run) if previous else []
+    history.append(run)
+    save_history(history)
+    print(f"\nrecorded in {HISTORY}")
+    if regressions and CHECK:
+        sys.exit(f"regressions: {', '.join(regressions)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from smtp_sink import SmtpSink
+
+MESSAGES = int(os.getenv("BENCH_MESSAGES", "500"))
+
+sink = SmtpSink().start()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.update(SMTP_SERVER="127.0.0.1", SMTP_PORT=str(sink.port), SMTP_STARTTLS="0", SMTP_USER="", SMTP_FROM="bench@example.com")
+
+from database import Base, engine
+from common import percentile
+from mailer import mailer
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    mailer.start()
+    data = {"qr_id": "bench", "name": "Bench", "surname": "Visitor", "company": "ACME", "host": "Host", "date": "01.01.2025", "visitors": 1}
+
+    latencies = []
+    started = time.perf_counter()
+    for i in range(MESSAGES):
+        t0 = time.perf_counter()
+        mailer.enqueue(f"visitor{i}@example.com", data)
+        latencies.append(time.perf_counter() - t0)
+    while sink.received < MESSAGES:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    mailer.stop()
+
+    print(f"messages:            {MESSAGES}")
+    print(f"delivered/s:         {MESSAGES / elapsed:.1f}")
+    print(f"enqueue p50 (ms):    {percentile(latencies, 50) * 1000:.2f}")
+    print(f"enqueue p99 (ms):    {percentile(latencies, 99) * 1000:.2f}")
+
+if __name__ == "__main__":
+    main()
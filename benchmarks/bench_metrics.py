@@ -0,0 +1,85 @@
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from sqlalchemy import select
+from database import engine, async_engine, AsyncSessionLocal, AccessCard
+from common import seed_visitors
+from checkin_cache import today_index
+import metrics
+
+ROWS = int(os.getenv("BENCH_ROWS", "20000"))
+CALLS = int(os.getenv("BENCH_CALLS", "2000"))
+ROUNDS = int(os.getenv("BENCH_ROUNDS", "12"))
+
+# Shaped like add_access_card: an index lookup, one query, a timed sub-stage
+@metrics.timed("bench_handler")
+async def handler(qr_id):
+    visitor = await today_index.alookup(qr_id)
+    with metrics.timer(metrics.STAGE_SECONDS, stage="bench_stage"):
+        async with AsyncSessionLocal() as db:
+            await db.execute(select(AccessCard.id).where(AccessCard.qr_id == visitor.qr_id).limit(1))
+
+async def run(qr_ids, enabled):
+    metrics.registry.enabled = enabled
+    t0 = time.perf_counter()
+    for qr_id in qr_ids:
+        await handler(qr_id)
+    return (time.perf_counter() - t0) / len(qr_ids)
+
+# Cost of the instrumentation alone, without the database noise around it
+def primitive_costs(number=100000):
+    metrics.registry.enabled = True
+    @metrics.timed("bench_noop")
+    def noop():
+        pass
+
+    def stage():
+        with metrics.timer(metrics.STAGE_SECONDS, stage="bench_noop"):
+            pass
+
+    conn = types.SimpleNamespace(info={})
+
+    def query():
+        metrics._before_cursor_execute(conn, None, "SELECT 1", None, None, False)
+        metrics._after_cursor_execute(conn, None, "SELECT 1", None, None, False)
+
+    for label, func in (("timed handler", noop), ("stage timer", stage), ("query hooks", query)):
+        print(f"{label:<14}{timeit.timeit(func, number=number) / number * 1e6:8.2f} us")
+
+async def main():
+    qr_ids = seed_visitors(ROWS)
+    for instrumented in (engine, async_engine):
+        metrics.instrument_engine(instrumented)
+    calls = [random.choice(qr_ids) for _ in range(CALLS)]
+    await run(calls, True)
+
+    # Paired rounds in alternating order: the second run of a pair is slower either way,
+    # so averaging the differences cancels that out
+    off, on = [], []
+    for i in range(ROUNDS):
+        if i % 2:
+            on.append(await run(calls, True))
+            off.append(await run(calls, False))
+        else:
+            off.append(await run(calls, False))
+            on.append(await run(calls, True))
+    base = statistics.median(off)
+    overhead = statistics.mean(b - a for a, b in zip(off, on))
+    print(f"{engine.dialect.name}: {CALLS} handler calls x {ROUNDS} rounds")
+    print(f"metrics off   {base * 1e6:8.1f} us / call")
+    print(f"overhead      {overhead * 1e6:8.1f} us / call ({overhead / base * 100:.2f} %)")
+    primitive_costs()
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,54 @@
+import datetime
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from sqlalchemy import insert
+from config import TARGET_TIMEZONE
+from database import Base, engine, Registered, CheckIn, CheckOut
+import partitions
+from occupancy import occupancy
+
+DAYS = int(os.getenv("BENCH_DAYS", "365"))
+VISITS_PER_DAY = int(os.getenv("BENCH_VISITS_PER_DAY", "500"))
+
+def seed():
+    now = datetime.datetime.now(TARGET_TIMEZONE)
+    with engine.begin() as conn:
+        for day in range(DAYS, -1, -1):
+            start = (now - datetime.timedelta(days=day)).replace(hour=8, minute=0)
+            visits = [(str(uuid.uuid4()), start + datetime.timedelta(seconds=i * 20)) for i in range(VISITS_PER_DAY)]
+            conn.execute(insert(Registered), [
+                {"qr_id": qr_id, "name": "N", "surname": "S", "company_name": "C", "visitors_count": 1, "host": "H", "visit_date": start.date()}
+                for qr_id, _ in visits
+            ])
+            conn.execute(insert(CheckIn), [{"qr_id": qr_id, "check_in_time": t} for qr_id, t in visits])
+            # Everybody leaves except half of today's visitors
+            conn.execute(insert(CheckOut), [
+                {"qr_id": qr_id, "check_out_time": t + datetime.timedelta(hours=4)}
+                for i, (qr_id, t) in enumerate(visits) if day > 0 or i % 2
+            ])
+
+def main():
+    partitions.create_partitioned_tables()
+    Base.metadata.create_all(bind=engine)
+    started = time.perf_counter()
+    seed()
+    print(f"seeded {DAYS} days x {VISITS_PER_DAY} visits in {time.perf_counter() - started:.1f}s on {engine.dialect.name}")
+
+    started = time.perf_counter()
+    occupancy.rebuild()
+    print(f"rebuild:       {(time.perf_counter() - started) * 1000:9.1f} ms")
+
+    started = time.perf_counter()
+    for _ in range(100000):
+        occupancy.counts()
+    print(f"counts():      {(time.perf_counter() - started) * 10:9.3f} us per read -> {occupancy.counts()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from config import TARGET_TIMEZONE
+from database import engine
+import partitions
+
+YEARS = int(os.getenv("BENCH_YEARS", "3"))
+CARDS_PER_DAY = int(os.getenv("BENCH_CARDS_PER_DAY", "2000"))
+
+# Same columns and indexes as access_cards had before partitioning
+PLAIN_DDL = (
+    "CREATE TABLE bench_access_cards_plain (id SERIAL PRIMARY KEY, qr_id VARCHAR NOT NULL, phone_number VARCHAR NOT NULL, "
+    "card_number VARCHAR NOT NULL, issue_time TIMESTAMP WITH TIME ZONE)"
+)
+
+def seed(conn, table, first_day, days):
+    conn.execute(text(
+        f"INSERT INTO {table} (qr_id, phone_number, card_number, issue_time) "
+        "SELECT md5(g::text), '+000', g::text, :start + (g * (:days * 86400.0 / :total)) * interval '1 second' "
+        "FROM generate_series(0, :total - 1) g"
+    ), {"start": first_day, "days": days, "total": days * CARDS_PER_DAY})
+
+def timed(conn, label, table, today_start):
+    started = time.perf_counter()
+    for _ in range(20):
+        count = conn.execute(text(f"SELECT count(*) FROM {table} WHERE issue_time >= :start"), {"start": today_start}).scalar()
+    print(f"{label:<14} {(time.perf_counter() - started) * 1000 / 20:9.2f} ms per 'cards issued today' query ({count} rows)")
+
+def main():
+    if not partitions.enabled():
+        sys.exit("This benchmark needs PostgreSQL, set DATABASE_URL.")
+    now = datetime.datetime.now(TARGET_TIMEZONE)
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    days = YEARS * 365
+    first_day = today_start - datetime.timedelta(days=days - 1)
+
+    partitions.create_partitioned_tables()
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS bench_access_cards_plain"))
+        conn.execute(text(PLAIN_DDL))
+        month = partitions._month_start(first_day)
+        while month <= today_start:
+            partitions._create_partition(conn, partitions.AccessCard.__table__, month)
+            month = partitions._add_months(month, 1)
+        started = time.perf_counter()
+        seed(conn, "bench_access_cards_plain", first_day, days)
+        seed(conn, "access_cards", first_day, days)
+        print(f"seeded {YEARS} years x {CARDS_PER_DAY} cards/day into both tables in {time.perf_counter() - started:.1f}s")
+        conn.execute(text("ANALYZE bench_access_cards_plain"))
+        conn.execute(text("ANALYZE access_cards"))
+
+    with engine.connect() as conn:
+        timed(conn, "unpartitioned", "bench_access_cards_plain", today_start)
+        timed(conn, "partitioned", "access_cards", today_start)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE bench_access_cards_plain"))
+
+if __name__ == "__main__":
+    main()
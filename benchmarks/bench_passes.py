@@ -0,0 +1,64 @@
+import base64
+import io
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import qrcode
+from reportlab.pdfgen import canvas
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+
+import passes
+
+PASSES = int(os.getenv("BENCH_PASSES", "300"))
+
+# Registration + email path as it was done inline in the Flet handlers
+def legacy_pass(data):
+    qr_img = qrcode.make(data["qr_id"])
+    buffer = io.BytesIO()
+    qr_img.save(buffer, format="PNG")
+    qr_b64 = base64.b64encode(buffer.getvalue()).decode("utf-8")
+    pdf_buffer = io.BytesIO()
+    c = canvas.Canvas(pdf_buffer)
+    c.setFont("Helvetica", 16)
+    c.drawString(1*inch, 10.5*inch, "Guest pass")
+    c.setFont("Helvetica", 12)
+    c.drawString(1*inch, 9.5*inch, f"Name: {data['name']} {data['surname']}")
+    c.drawString(1*inch, 9.2*inch, f"Company: {data['company']}")
+    c.drawString(1*inch, 8.9*inch, f"Host: {data['host']}")
+    c.drawString(1*inch, 8.6*inch, f"Date of visit: {data['date']}")
+    c.drawString(1*inch, 8.3*inch, f"Number of visitors: {data['visitors']}")
+    c.drawImage(ImageReader(io.BytesIO(base64.b64decode(qr_b64))), 1*inch, 4*inch, width=3*inch, height=3*inch)
+    for y, text in passes.FOOTER_ROWS:
+        c.drawString(1*inch, y*inch, text)
+    c.showPage()
+    c.save()
+    return pdf_buffer.getvalue()
+
+def new_pass(data):
+    passes.qr_base64(data["qr_id"])
+    return passes.render_pass_pdf(data)
+
+def measure(label, func):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {PASSES / elapsed:10.1f} passes/s")
+
+def main():
+    items = [
+        {"qr_id": str(uuid.uuid4()), "name": "Name", "surname": f"Surname{i}", "company": "ACME", "host": "Host", "date": "01.01.2025", "visitors": 1}
+        for i in range(PASSES)
+    ]
+    measure("legacy (register + email)", lambda: [legacy_pass(d) for d in items])
+    measure("cached, cold", lambda: [new_pass(d) for d in items])
+    measure("cached, re-send", lambda: [new_pass(d) for d in items])
+    passes.pass_cache.clear()
+    passes.qr_png.cache_clear()
+    measure(f"batch, {passes.PASS_BATCH_WORKERS} processes", lambda: passes.render_passes(items))
+
+if __name__ == "__main__":
+    main()
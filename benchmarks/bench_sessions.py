@@ -0,0 +1,90 @@
+import asyncio
+import gc
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from flet.core.local_connection import LocalConnection
+from flet.core.page import Page
+from flet.core.protocol import ClientMessage, ClientActions, CommandEncoder, PageCommandsBatchResponsePayload
+from common import percentile
+
+SESSIONS = int(os.getenv("BENCH_SESSIONS", "200"))
+VIEWS = 7
+
+# Does what flet's web connection does with every update (assign control ids, serialize the
+# messages for the browser), minus the websocket
+class NullConnection(LocalConnection):
+    def __init__(self):
+        super().__init__()
+        self.sent_bytes = 0
+
+    def send_commands(self, session_id, commands):
+        results, messages = [], []
+        for command in commands:
+            result, message = self._process_command(command)
+            if command.name in ("add", "get"):
+                results.append(result)
+            if message:
+                messages.append(message)
+        if messages:
+            self.sent_bytes += len(json.dumps(ClientMessage(ClientActions.PAGE_CONTROLS_BATCH, messages), cls=CommandEncoder, separators=(",", ":")))
+        return PageCommandsBatchResponsePayload(results=results, error="")
+
+    def send_command(self, session_id, command):
+        return self.send_commands(session_id, [command])
+
+def navigate(page, index):
+    page.navigation_bar.selected_index = index
+    page.navigation_bar.on_change(type("Event", (), {"control": page.navigation_bar})())
+
+def measure(label, step):
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    timings = []
+    for i in range(SESSIONS):
+        t0 = time.perf_counter()
+        step(i)
+        timings.append(time.perf_counter() - t0)
+    gc.collect()
+    per_session = (tracemalloc.get_traced_memory()[0] - before) / SESSIONS
+    print(f"{label:<28} {per_session / 1024:8.1f} KiB/session   p50 {percentile(timings, 50) * 1000:6.2f} ms   p95 {percentile(timings, 95) * 1000:6.2f} ms")
+
+def main():
+    import app
+
+    # Page handlers schedule background work on the session's loop, as under uvicorn
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    # What the server's startup hook does before pages get the full app
+    asyncio.run_coroutine_threadsafe(app.startup.run(), loop).result()
+
+    pages = []
+
+    def open_session(i):
+        page = Page(NullConnection(), f"bench-{i}", loop=loop)
+        app.main(page)
+        pages.append(page)
+
+    def visit_all_views(i):
+        for index in (*range(1, VIEWS), 0):
+            navigate(pages[i], index)
+
+    tracemalloc.start()
+    print(f"{SESSIONS} concurrent pages")
+    measure("open page", open_session)
+    first_render = sum(page._Page__conn.sent_bytes for page in pages) / SESSIONS
+    measure("visit every view", visit_all_views)
+    tracemalloc.stop()
+    print(f"first render sent {first_render / 1024:.1f} KiB/session")
+    asyncio.run_coroutine_threadsafe(app.async_engine.dispose(), loop).result()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import datetime
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from sqlalchemy import text
+from database import engine
+from migrate import upgrade
+
+ROWS = int(os.getenv("BENCH_ROWS", "5000000"))
+DAYS = 3 * 365
+
+# Table as created by older versions: visit_date stored as 'dd.mm.YYYY' text, no date index
+LEGACY_DDL = (
+    "CREATE TABLE registered (id INTEGER PRIMARY KEY, qr_id VARCHAR NOT NULL UNIQUE, name VARCHAR NOT NULL, surname VARCHAR NOT NULL, "
+    "company_name VARCHAR, visitors_count INTEGER NOT NULL, host VARCHAR NOT NULL, visit_date VARCHAR NOT NULL, registration_time TIMESTAMP)"
+)
+
+def seed():
+    first_day = datetime.date.today() - datetime.timedelta(days=DAYS - 30)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS registered"))
+        conn.execute(text(LEGACY_DDL))
+        for start in range(0, ROWS, 50000):
+            rows = [
+                {"id": i + 1, "qr_id": str(uuid.uuid4()), "visit_date": (first_day + datetime.timedelta(days=i % DAYS)).strftime("%d.%m.%Y")}
+                for i in range(start, min(start + 50000, ROWS))
+            ]
+            conn.execute(text("INSERT INTO registered (id, qr_id, name, surname, company_name, visitors_count, host, visit_date) VALUES (:id, :qr_id, 'N', 'S', 'C', 1, 'H', :visit_date)"), rows)
+
+def this_week():
+    monday = datetime.date.today() - datetime.timedelta(days=datetime.date.today().weekday())
+    return [monday + datetime.timedelta(days=i) for i in range(7)]
+
+def timed(label, sql, params):
+    with engine.connect() as conn:
+        started = time.perf_counter()
+        count = conn.execute(text(sql), params).scalar()
+        print(f"{label:<32} {(time.perf_counter() - started) * 1000:9.1f} ms  ({count} visitors)")
+
+def main():
+    started = time.perf_counter()
+    seed()
+    print(f"seeded {ROWS} rows in {time.perf_counter() - started:.1f}s on {engine.dialect.name}")
+    week = this_week()
+    string_params = {f"d{i}": day.strftime("%d.%m.%Y") for i, day in enumerate(week)}
+    timed("before: text IN (7 days)", f"SELECT sum(visitors_count) FROM registered WHERE visit_date IN ({', '.join(':' + k for k in string_params)})", string_params)
+
+    started = time.perf_counter()
+    upgrade(["visit_date_to_date"])
+    print(f"migration took {time.perf_counter() - started:.1f}s")
+    timed("after: DATE range, indexed", "SELECT sum(visitors_count) FROM registered WHERE visit_date BETWEEN :start AND :end", {"start": week[0], "end": week[-1]})
+
+if __name__ == "__main__":
+    main()
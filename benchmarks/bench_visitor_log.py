@@ -0,0 +1,86 @@
+import asyncio
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from sqlalchemy import insert, text
+from database import Base, engine, async_engine, Registered
+from common import percentile
+from migrate import visitor_log_indexes
+from visitor_log import LogWindow, fetch_page, log_query
+
+ROWS = int(os.getenv("BENCH_ROWS", "200000"))
+SEARCHES = int(os.getenv("BENCH_SEARCHES", "50"))
+NAMES = ["Anna", "Boris", "Clara", "Dmitri", "Elena", "Felix", "Galina", "Hugo", "Irina", "Jonas"]
+SURNAMES = ["Ivanov", "Smith", "Jones", "Petrova", "Kowalski", "Novak", "Berg", "Lind", "Ozols", "Tamm"]
+COMPANIES = ["ACME", "Globex", "Initech", "Umbrella", "Hooli", "Stark", "Wayne", "Wonka"]
+HOSTS = ["Reception", "IT", "Finance", "Sales", "Legal"]
+
+def seed():
+    start = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+    with engine.begin() as conn:
+        for offset in range(0, ROWS, 10000):
+            conn.execute(insert(Registered), [
+                {
+                    "qr_id": str(uuid.uuid4()), "name": random.choice(NAMES), "surname": f"{random.choice(SURNAMES)}{i % 997}",
+                    "company_name": random.choice(COMPANIES), "visitors_count": 1, "host": random.choice(HOSTS),
+                    "visit_date": (start + datetime.timedelta(minutes=i)).date(), "registration_time": start + datetime.timedelta(minutes=i),
+                }
+                for i in range(offset, min(offset + 10000, ROWS))
+            ])
+    visitor_log_indexes()
+
+async def timed(label, calls):
+    latencies = []
+    for call in calls:
+        t0 = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - t0)
+    print(f"{label:<26} p50 {percentile(latencies, 50) * 1000:8.2f} ms   p99 {percentile(latencies, 99) * 1000:8.2f} ms")
+
+async def offset_page(page_number):
+    # What a naive LIMIT/OFFSET log would do, for comparison with the keyset query
+    query = log_query(dialect=engine.dialect.name).offset(page_number * 50)
+    with engine.connect() as conn:
+        conn.execute(query).all()
+
+async def main():
+    Base.metadata.create_all(bind=engine)
+    # BENCH_ROWS=0 benchmarks an already populated database
+    if ROWS:
+        seed()
+    with engine.connect() as conn:
+        total = conn.execute(text("SELECT count(*) FROM registered")).scalar()
+    print(f"{engine.dialect.name}: {total} registrations")
+
+    await timed("first page", [fetch_page] * 20)
+
+    window = LogWindow()
+    await window.reset()
+    pages = [window.next for _ in range(200)]
+    await timed("next page (keyset)", pages)
+    await timed("page 2000 (offset)", [lambda: offset_page(2000)] * 5)
+
+    terms = [random.choice(SURNAMES)[:3] for _ in range(SEARCHES)] + [random.choice(COMPANIES)[:4] for _ in range(SEARCHES)]
+    await timed("search, first page", [lambda t=t: fetch_page(t) for t in terms])
+
+    tracemalloc.start()
+    window = LogWindow()
+    await window.reset()
+    for _ in range(500):
+        await window.next()
+    _, peak = tracemalloc.get_traced_memory()
+    print(f"500 pages scrolled: {len(window.rows)} rows kept, peak {peak / 1024:.0f} KiB")
+    # Pooled aiosqlite connections keep non-daemon threads alive
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
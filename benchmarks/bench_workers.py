@@ -0,0 +1,155 @@
+import asyncio
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKER_COUNTS = [int(n) for n in os.getenv("BENCH_WORKER_COUNTS", "1,2,4").split(",")]
+SECONDS = float(os.getenv("BENCH_SECONDS", "10"))  # registration phase; check-in goes through every registered visitor
+CLIENTS = int(os.getenv("BENCH_CLIENTS", "2"))  # load generator processes
+CONNECTIONS = int(os.getenv("BENCH_CONNECTIONS", "16"))  # keep-alive connections per load generator
+CONTENT_LENGTH = re.compile(rb"content-length: *(\d+)", re.I)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+# --- Load generator: a separate process with CONNECTIONS keep-alive connections to the balancer ---
+async def post(reader, writer, path, body):
+    data = json.dumps(body).encode()
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+    head = await reader.readuntil(b"\r\n\r\n")
+    response = await reader.readexactly(int(CONTENT_LENGTH.search(head).group(1)))
+    return int(head[9:12]), response
+
+async def register(port, until):
+    qr_ids, errors = [], 0
+
+    async def connection(number):
+        nonlocal errors
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        i = 0
+        while time.perf_counter() < until:
+            i += 1
+            status, body = await post(reader, writer, "/api/visitors", {
+                "name": f"Name{number}", "surname": f"Surname{i}", "company_name": "Bench", "host": "Host", "visitors_count": 1,
+            })
+            if status == 201:
+                qr_ids.append(json.loads(body)["qr_id"])
+            else:
+                errors += 1
+        writer.close()
+
+    await asyncio.gather(*(connection(i) for i in range(CONNECTIONS)))
+    return {"qr_ids": qr_ids, "errors": errors}
+
+async def check_in(port, qr_ids):
+    pending = iter(qr_ids)
+    done, errors = 0, 0
+
+    async def connection():
+        nonlocal done, errors
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for qr_id in pending:
+            status, _ = await post(reader, writer, "/api/scans/check-in", {"qr_id": qr_id})
+            if status == 200:
+                done += 1
+            else:
+                errors += 1
+        writer.close()
+
+    await asyncio.gather(*(connection() for _ in range(CONNECTIONS)))
+    return {"done": done, "errors": errors}
+
+def client(mode, port, start_at):
+    port, start_at = int(port), float(start_at)
+    time.sleep(max(0.0, start_at - time.time()))
+    started = time.perf_counter()
+    if mode == "register":
+        result = asyncio.run(register(port, started + SECONDS))
+    else:
+        result = asyncio.run(check_in(port, json.load(sys.stdin)))
+    result["seconds"] = time.perf_counter() - started
+    json.dump(result, sys.stdout)
+
+# --- One run: start workers.py with WORKERS=n, register for SECONDS, then check everyone in ---
+def healthy(port):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=2) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+def run_clients(mode, port, inputs):
+    start_at = time.time() + 0.5
+    processes = [
+        subprocess.Popen([sys.executable, __file__, "client", mode, str(port), str(start_at)], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for _ in range(CLIENTS)
+    ]
+    results = [json.loads(process.communicate(json.dumps(data))[0]) for process, data in zip(processes, inputs)]
+    # All generators start together, so the slowest one spans the whole phase
+    return results, max(result["seconds"] for result in results)
+
+def run(workers, tmp):
+    port, base_port = free_port(), free_port()
+    env = dict(
+        os.environ, WORKERS=str(workers), SERVER_HOST="127.0.0.1", SERVER_PORT=str(port), WORKER_BASE_PORT=str(base_port),
+        EVENT_SOCKET=os.path.join(tmp, f"events-{workers}.sock"), SMTP_SERVER="", METRICS_QUERY_WARN="1000000",
+    )
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tmp, f'bench-{workers}.db')}")
+    supervisor = subprocess.Popen([sys.executable, "workers.py"], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 120
+        while not all(healthy(base_port + i) for i in range(workers)):
+            if time.time() > deadline:
+                raise RuntimeError(f"{workers} workers not ready after 120 s")
+            time.sleep(0.2)
+
+        results, elapsed = run_clients("register", port, [[]] * CLIENTS)
+        registered = sum(len(result["qr_ids"]) for result in results)
+        register_errors = sum(result["errors"] for result in results)
+        register_rate = registered / elapsed
+
+        # Each generator checks in visitors registered by another, so most scans land on a different worker
+        qr_ids = [result["qr_ids"] for result in results]
+        results, elapsed = run_clients("check_in", port, qr_ids[1:] + qr_ids[:1])
+        checked_in = sum(result["done"] for result in results)
+        check_in_errors = sum(result["errors"] for result in results)
+        return {
+            "workers": workers, "registered": registered, "register_per_s": register_rate, "checked_in": checked_in,
+            "check_in_per_s": checked_in / elapsed, "errors": register_errors + check_in_errors,
+        }
+    finally:
+        supervisor.terminate()
+        supervisor.wait()
+
+def main():
+    cpus = os.cpu_count() or 1
+    print(f"{cpus} CPUs, {CLIENTS} load generators x {CONNECTIONS} connections, database {os.getenv('DATABASE_URL', 'sqlite (temporary)').split(':')[0]}")
+    if max(WORKER_COUNTS) + CLIENTS > cpus:
+        print(f"note: {max(WORKER_COUNTS)} workers plus {CLIENTS} load generators need more than {cpus} CPUs, the runs share cores and cannot scale")
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = [run(workers, tmp) for workers in WORKER_COUNTS]
+    base = runs[0]
+    print(f"\n{'workers':>7} {'register/s':>11} {'speedup':>8} {'check-in/s':>11} {'speedup':>8} {'errors':>7}")
+    for r in runs:
+        scale = r["workers"] / base["workers"]
+        register_speedup = r["register_per_s"] / base["register_per_s"]
+        check_in_speedup = r["check_in_per_s"] / base["check_in_per_s"]
+        print(
+            f"{r['workers']:>7} {r['register_per_s']:>11.1f} {register_speedup:>7.2f}x {r['check_in_per_s']:>11.1f} {check_in_speedup:>7.2f}x {r['errors']:>7}"
+            f"   (efficiency {register_speedup / scale * 100:.0f} % / {check_in_speedup / scale * 100:.0f} %)"
+        )
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["client"]:
+        client(*sys.argv[2:])
+    else:
+        main()
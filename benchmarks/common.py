@@ -0,0 +1,30 @@
+import datetime
+import uuid
+
+# Helpers shared by the benchmark scripts. The database modules are imported on call,
+# after the script has set DATABASE_URL.
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+# Creates the tables and COUNT visitors, every TODAY_EVERY-th one expected today and the rest
+# on a day long past; returns the qr_ids of today's visitors
+def seed_visitors(count, today_every=1, chunk=10000):
+    from sqlalchemy import insert
+    from database import Base, engine, Registered
+    from checkin_cache import today_date
+
+    Base.metadata.create_all(bind=engine)
+    today = today_date()
+    qr_ids = []
+    with engine.begin() as conn:
+        for start in range(0, count, chunk):
+            rows = []
+            for i in range(start, min(start + chunk, count)):
+                qr_id = str(uuid.uuid4())
+                visit_date = today if i % today_every == 0 else datetime.date(2020, 1, 1)
+                if visit_date == today:
+                    qr_ids.append(qr_id)
+                rows.append({"qr_id": qr_id, "name": "N", "surname": "S", "company_name": "C", "visitors_count": 1, "host": "H", "visit_date": visit_date})
+            conn.execute(insert(Registered), rows)
+    return qr_ids
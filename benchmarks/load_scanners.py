@@ -0,0 +1,120 @@
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from config import SCANNER_API_KEY
+from common import percentile, seed_visitors
+
+BENCH_URL = os.getenv("BENCH_URL", "")  # load an already running server instead of starting one
+BENCH_PATH = os.getenv("BENCH_PATH", "")  # e.g. /api/scans/validate, default alternates check-in and check-out
+VISITORS = int(os.getenv("BENCH_VISITORS", "5000"))
+SCANS = int(os.getenv("BENCH_SCANS", "20000"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "200"))
+
+def start_server():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:server", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=os.environ.copy(),
+    )
+    return server, f"http://127.0.0.1:{port}"
+
+# Minimal keep-alive HTTP/1.1 client: one connection per scanner, cheap enough that the
+# load generator does not become the bottleneck on the same machine
+class Scanner:
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def post(self, path, body):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        key = f"X-API-Key: {SCANNER_API_KEY}\r\n" if SCANNER_API_KEY else ""
+        payload = json.dumps(body).encode()
+        self.writer.write(
+            f"POST {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n{key}Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+        )
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while (line := await self.reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.partition(b":")
+            if name.lower() == b"content-length":
+                length = int(value)
+        await self.reader.readexactly(length)
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+async def wait_ready(host, port, deadline=60):
+    started = time.monotonic()
+    while time.monotonic() - started < deadline:
+        scanner = Scanner(host, port)
+        try:
+            # 503 until the server's startup has reached the database
+            if await scanner.post("/api/scans/validate", {"qr_id": "ping"}) != 503:
+                return
+        except OSError:
+            pass
+        finally:
+            scanner.close()
+        await asyncio.sleep(0.5)
+    raise RuntimeError("server did not start")
+
+async def run(base_url, qr_ids):
+    url = urlsplit(base_url)
+    await wait_ready(url.hostname, url.port)
+    scanners = [Scanner(url.hostname, url.port) for _ in range(CONCURRENCY)]
+    # Warm the server-side index of today's visitors
+    await scanners[0].post("/api/scans/validate", {"qr_id": qr_ids[0]})
+
+    latencies = []
+    statuses = Counter()
+    remaining = iter(range(SCANS))
+
+    async def scan(scanner):
+        for i in remaining:
+            path = BENCH_PATH or ("/api/scans/check-in" if i % 2 == 0 else "/api/scans/check-out")
+            t0 = time.perf_counter()
+            statuses[await scanner.post(path, {"qr_id": random.choice(qr_ids)})] += 1
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(scan(scanner) for scanner in scanners))
+    elapsed = time.perf_counter() - t0
+    for scanner in scanners:
+        scanner.close()
+
+    print(f"{SCANS} scans from {CONCURRENCY} scanners in {elapsed:.2f} s: {SCANS / elapsed:.0f} scans/s")
+    print(f"latency p50 {percentile(latencies, 50) * 1000:.1f} ms   p99 {percentile(latencies, 99) * 1000:.1f} ms   statuses {dict(statuses)}")
+
+def main():
+    qr_ids = seed_visitors(VISITORS)
+    server = None
+    base_url = BENCH_URL
+    if not base_url:
+        server, base_url = start_server()
+    try:
+        asyncio.run(run(base_url, qr_ids))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    main()
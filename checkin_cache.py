@@ -0,0 +1,114 @@
+import asyncio
+import datetime
+import threading
+from collections import namedtuple
+
+from config import TARGET_TIMEZONE
+from database import SessionLocal, Registered
+
+Visitor = namedtuple("Visitor", "qr_id visit_date host visitors_count name surname company_name")
+
+VISITOR_COLUMNS = (
+    Registered.id, Registered.qr_id, Registered.visit_date, Registered.host, Registered.visitors_count,
+    Registered.name, Registered.surname, Registered.company_name,
+)
+
+def _visitor(row):
+    return Visitor(row.qr_id, row.visit_date, row.host, row.visitors_count, row.name, row.surname, row.company_name)
+
+def today_date():
+    return datetime.datetime.now(TARGET_TIMEZONE).date()
+
+# --- In-memory index of visitors expected today, keyed by qr_id ---
+class TodayIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.day = None
+        self.entries = {}
+        self.max_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, day):
+        db = SessionLocal()
+        try:
+            rows = db.query(*VISITOR_COLUMNS).filter(Registered.visit_date == day).all()
+        finally:
+            db.close()
+        self.entries = {row.qr_id: _visitor(row) for row in rows}
+        self.max_id = max((row.id for row in rows), default=0)
+        self.day = day
+
+    def _current(self):
+        day = today_date()
+        if self.day != day:
+            self._load(day)
+        return day
+
+    def lookup(self, qr_id):
+        with self.lock:
+            self._current()
+            visitor = self.entries.get(qr_id)
+            if visitor is not None:
+                self.hits += 1
+                return visitor
+            self.misses += 1
+
+        db = SessionLocal()
+        try:
+            row = db.query(*VISITOR_COLUMNS).filter(Registered.qr_id == qr_id).first()
+        finally:
+            db.close()
+        if row is None:
+            return None
+        visitor = _visitor(row)
+        self.add(visitor, row.id)
+        return visitor
+
+    # Hits never leave the event loop, misses and day rollover go to a worker thread
+    async def alookup(self, qr_id):
+        with self.lock:
+            if self.day == today_date():
+                visitor = self.entries.get(qr_id)
+                if visitor is not None:
+                    self.hits += 1
+                    return visitor
+        return await asyncio.to_thread(self.lookup, qr_id)
+
+    # Never loads the day, async callers hold the event loop: a day not loaded yet is read
+    # from the database on its first lookup, committed rows included
+    def add(self, visitor, row_id=0):
+        with self.lock:
+            if visitor.visit_date == self.day == today_date():
+                self.entries[visitor.qr_id] = visitor
+                self.max_id = max(self.max_id, row_id)
+
+    def update_count(self, qr_id, visitors_count):
+        with self.lock:
+            visitor = self.entries.get(qr_id)
+            if visitor is not None:
+                self.entries[qr_id] = visitor._replace(visitors_count=visitors_count)
+
+    def refresh(self):
+        with self.lock:
+            day = self._current()
+            max_id = self.max_id
+        db = SessionLocal()
+        try:
+            rows = db.query(*VISITOR_COLUMNS).filter(Registered.visit_date == day, Registered.id > max_id).all()
+        finally:
+            db.close()
+        for row in rows:
+            self.add(_visitor(row), row.id)
+        return len(rows)
+
+    # After missed events (RESYNC) newer rows are not enough, changed counts are only seen by reading the whole day
+    def reload(self):
+        with self.lock:
+            self._load(today_date())
+
+    def stats(self):
+        with self.lock:
+            return {"day": self.day, "size": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+today_index = TodayIndex()
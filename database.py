@@ -0,0 +1,76 @@
+import datetime
+from sqlalchemy import create_engine, make_url, Column, Integer, String, Date, DateTime, Index
+from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from config import (
+    DATABASE_URL, ASYNC_DATABASE_URL, TARGET_TIMEZONE, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE, DB_STATEMENT_CACHE_SIZE,
+)
+
+def _pool_options(url):
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW, "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE, "pool_pre_ping": True,
+    }
+
+def async_url(url):
+    url = make_url(url)
+    if url.get_backend_name() == "postgresql":
+        return url.set(drivername="postgresql+asyncpg").update_query_dict({"prepared_statement_cache_size": str(DB_STATEMENT_CACHE_SIZE)})
+    if url.get_backend_name() == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite")
+    return url
+
+engine = create_engine(DATABASE_URL, **_pool_options(DATABASE_URL))
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# --- Async engine used by the page handlers ---
+async_engine = create_async_engine(ASYNC_DATABASE_URL or async_url(DATABASE_URL), **_pool_options(DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+class Base(DeclarativeBase): pass
+
+# --- If table exists  ---
+class Registered(Base):
+    __tablename__ = "registered"
+    id = Column(Integer, primary_key=True, index=True)
+    qr_id = Column(String, unique=True, index=True, nullable=False)
+    name = Column(String, nullable=False)
+    surname = Column(String, nullable=False)
+    company_name = Column(String, nullable=True)
+    visitors_count = Column(Integer, nullable=False)
+    host = Column(String, nullable=False)
+    visit_date = Column(Date, nullable=False)
+    registration_time = Column(DateTime(timezone=True), default=lambda: datetime.datetime.now(TARGET_TIMEZONE))
+    __table_args__ = (
+        Index("ix_registered_visit_date_qr_id", "visit_date", "qr_id"),
+        Index("ix_registered_registration_time_id", "registration_time", "id"),
+    )
+
+class CheckIn(Base):
+    __tablename__ = "check_in"
+    id = Column(Integer, primary_key=True, index=True)
+    qr_id = Column(String, index=True)
+    check_in_time = Column(DateTime(timezone=True), default=lambda: datetime.datetime.now(TARGET_TIMEZONE))
+    event_id = Column(String, nullable=True)  # set by edge nodes, makes journal replays idempotent
+    __table_args__ = (Index("ux_check_in_event_id", "event_id", "check_in_time", unique=True),)
+
+class CheckOut(Base):
+    __tablename__ = "check_out"
+    id = Column(Integer, primary_key=True, index=True)
+    qr_id = Column(String, index=True)
+    check_out_time = Column(DateTime(timezone=True), default=lambda: datetime.datetime.now(TARGET_TIMEZONE))
+    event_id = Column(String, nullable=True)
+    __table_args__ = (Index("ux_check_out_event_id", "event_id", "check_out_time", unique=True),)
+
+# --- Access Cards ---
+class AccessCard(Base):
+    __tablename__ = "access_cards"
+    id = Column(Integer, primary_key=True, index=True)
+    qr_id = Column(String, index=True, nullable=False)
+    phone_number = Column(String, nullable=False)
+    card_number = Column(String, nullable=False)
+    issue_time = Column(DateTime(timezone=True), default=lambda: datetime.datetime.now(TARGET_TIMEZONE))
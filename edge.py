@@ -0,0 +1,175 @@
+import datetime
+import os
+import threading
+import time
+import uuid
+from sqlalchemy import create_engine, event, MetaData, Table, Column, Integer, String, Date, Boolean, select, delete, update, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from config import TARGET_TIMEZONE, EDGE_MODE, EDGE_DB_PATH, EDGE_SYNC_SECONDS, EDGE_SYNC_BATCH, EDGE_PREFETCH_SECONDS
+from database import engine, Registered, CheckIn, CheckOut
+from checkin_cache import Visitor, VISITOR_COLUMNS, today_date
+from events import REGISTERED, VISITORS_IMPORTED, VISITORS_UPDATED
+
+CHECK_IN = "in"
+CHECK_OUT = "out"
+
+def _log(message):
+    print(f"[edge] {message}", flush=True)
+
+# --- Local SQLite: replica of today's and tomorrow's registrations plus the scan journal ---
+metadata = MetaData()
+
+visitors = Table(
+    "visitors", metadata,
+    Column("qr_id", String, primary_key=True),
+    Column("visit_date", Date, nullable=False, index=True),
+    Column("host", String, nullable=False),
+    Column("visitors_count", Integer, nullable=False),
+    Column("name", String, nullable=False),
+    Column("surname", String, nullable=False),
+    Column("company_name", String),
+)
+
+journal = Table(
+    "journal", metadata,
+    Column("seq", Integer, primary_key=True, autoincrement=True),
+    Column("event_id", String, nullable=False, unique=True),
+    Column("kind", String, nullable=False),
+    Column("qr_id", String, nullable=False),
+    Column("time", String, nullable=False),  # ISO 8601 with offset, SQLite would drop the time zone
+    Column("synced", Boolean, nullable=False, default=False, index=True),
+)
+
+def _sqlite_pragmas(dbapi_connection, _):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+def _insert_ignoring_duplicates(dialect, model, time_column):
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    return insert(model).on_conflict_do_nothing(index_elements=["event_id", time_column])
+
+class EdgeReplica:
+    def __init__(self, path=EDGE_DB_PATH, central=engine):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.local = create_engine(f"sqlite:///{path}")
+        event.listen(self.local, "connect", _sqlite_pragmas)
+        metadata.create_all(self.local)
+        self.central = central
+        self.wake = threading.Event()
+        self.online = None
+        self.last_sync = None
+        self.last_prefetch = None
+        self.prefetched_at = None
+
+    # --- Replica ---
+    def prefetch(self):
+        today = today_date()
+        with self.central.connect() as conn:
+            rows = conn.execute(select(*VISITOR_COLUMNS).where(Registered.visit_date.in_([today, today + datetime.timedelta(days=1)]))).all()
+        with self.local.begin() as conn:
+            conn.execute(delete(visitors))
+            if rows:
+                conn.execute(visitors.insert(), [_visitor_row(row) for row in rows])
+        self.last_prefetch = datetime.datetime.now(TARGET_TIMEZONE)
+        self.prefetched_at = time.monotonic()
+        return len(rows)
+
+    def lookup(self, qr_id):
+        with self.local.connect() as conn:
+            row = conn.execute(select(visitors).where(visitors.c.qr_id == qr_id)).first()
+        return Visitor(row.qr_id, row.visit_date, row.host, row.visitors_count, row.name, row.surname, row.company_name) if row else None
+
+    def add(self, visitor):
+        today = today_date()
+        if today <= visitor.visit_date <= today + datetime.timedelta(days=1):
+            with self.local.begin() as conn:
+                conn.execute(sqlite.insert(visitors).values(**visitor._asdict()).on_conflict_do_update(index_elements=["qr_id"], set_=visitor._asdict()))
+
+    def apply_event(self, event):
+        topic = event["topic"]
+        if topic == REGISTERED:
+            self.add(Visitor(event["qr_id"], datetime.date.fromisoformat(event["visit_date"]), event["host"], event["visitors_count"], event["name"], event["surname"], event["company_name"]))
+        elif topic == VISITORS_UPDATED:
+            with self.local.begin() as conn:
+                conn.execute(update(visitors).where(visitors.c.qr_id == event["qr_id"]).values(visitors_count=event["visitors_count"]))
+        elif topic == VISITORS_IMPORTED:
+            self.prefetched_at = None
+            self.wake.set()
+
+    # --- Journal ---
+    def record(self, kind, qr_id, at):
+        event_id = str(uuid.uuid4())
+        with self.local.begin() as conn:
+            conn.execute(journal.insert().values(event_id=event_id, kind=kind, qr_id=qr_id, time=at.isoformat(), synced=False))
+        # Ship right away while the central database is reachable, otherwise wait for the retry
+        if self.online:
+            self.wake.set()
+        return event_id
+
+    def pending(self):
+        with self.local.connect() as conn:
+            return conn.execute(select(func.count()).select_from(journal).where(journal.c.synced.is_(False))).scalar()
+
+    # Safe to repeat: the central tables ignore event ids they already have
+    def sync_once(self, batch_size=EDGE_SYNC_BATCH):
+        with self.local.connect() as conn:
+            rows = conn.execute(select(journal).where(journal.c.synced.is_(False)).order_by(journal.c.seq).limit(batch_size)).all()
+        if not rows:
+            return 0
+        check_ins = [{"event_id": r.event_id, "qr_id": r.qr_id, "check_in_time": datetime.datetime.fromisoformat(r.time)} for r in rows if r.kind == CHECK_IN]
+        check_outs = [{"event_id": r.event_id, "qr_id": r.qr_id, "check_out_time": datetime.datetime.fromisoformat(r.time)} for r in rows if r.kind == CHECK_OUT]
+        dialect = self.central.dialect.name
+        with self.central.begin() as conn:
+            if check_ins:
+                conn.execute(_insert_ignoring_duplicates(dialect, CheckIn, "check_in_time"), check_ins)
+            if check_outs:
+                conn.execute(_insert_ignoring_duplicates(dialect, CheckOut, "check_out_time"), check_outs)
+        with self.local.begin() as conn:
+            conn.execute(update(journal).where(journal.c.seq <= rows[-1].seq, journal.c.synced.is_(False)).values(synced=True))
+            conn.execute(delete(journal).where(journal.c.synced.is_(True), journal.c.time < (datetime.datetime.now(TARGET_TIMEZONE) - datetime.timedelta(days=1)).isoformat()))
+        self.last_sync = datetime.datetime.now(TARGET_TIMEZONE)
+        return len(rows)
+
+    def sync(self):
+        shipped = 0
+        while (count := self.sync_once()):
+            shipped += count
+        return shipped
+
+    def _set_online(self, online, error=None):
+        if online != self.online:
+            _log("central database reachable" if online else f"central database unreachable, scans are journaled locally: {error}")
+        self.online = online
+
+    def _prefetch_due(self):
+        return self.prefetched_at is None or time.monotonic() - self.prefetched_at >= EDGE_PREFETCH_SECONDS or self.last_prefetch.date() != today_date()
+
+    # Retries with exponential backoff while the central database is unreachable
+    def _loop(self):
+        delay = EDGE_SYNC_SECONDS
+        while True:
+            try:
+                if self._prefetch_due():
+                    self.prefetch()
+                self.sync()
+                self._set_online(True)
+                delay = EDGE_SYNC_SECONDS
+            except Exception as ex:
+                self._set_online(False, ex)
+                delay = min(delay * 2, 60)
+            self.wake.wait(delay)
+            self.wake.clear()
+
+    def start(self):
+        threading.Thread(target=self._loop, name="edge-sync", daemon=True).start()
+
+    def stats(self):
+        return {"online": self.online, "pending": self.pending(), "last_sync": self.last_sync, "last_prefetch": self.last_prefetch}
+
+replica = EdgeReplica() if EDGE_MODE else None
+
+def _visitor_row(row):
+    return {"qr_id": row.qr_id, "visit_date": row.visit_date, "host": row.host, "visitors_count": row.visitors_count, "name": row.name, "surname": row.surname, "company_name": row.company_name}
@@ -0,0 +1,156 @@
+import json
+import queue
+from collections import deque
+import socket
+import threading
+import time
+import uuid
+from sqlalchemy import text
+
+from config import EVENT_BUS_BACKEND, EVENT_CHANNEL, EVENT_POLL_SECONDS, EVENT_SOCKET, EVENT_BUFFER_SIZE
+from database import engine
+
+REGISTERED = "registered"
+VISITORS_IMPORTED = "visitors_imported"
+VISITORS_UPDATED = "visitors_updated"
+CHECKED_IN = "checked_in"
+CHECKED_OUT = "checked_out"
+CARD_ISSUED = "card_issued"
+EMAIL_STATUS = "email_status"
+# Delivered locally after a lost hub connection: events may have been missed, shared state should be reloaded
+RESYNC = "resync"
+
+def _log(message):
+    print(f"[events] {message}", flush=True)
+
+# --- In-process publish/subscribe, optionally bridged between processes by PostgreSQL NOTIFY or the workers.py hub ---
+class EventBus:
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self.subscribers = {}
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.dispatcher = None
+        self.listener = None
+        self.hub = None
+        self.hub_lock = threading.Lock()
+        self.unsent = deque(maxlen=EVENT_BUFFER_SIZE)
+
+    def start(self):
+        if self.dispatcher is None:
+            self.dispatcher = threading.Thread(target=self._dispatch_loop, name="event-dispatcher", daemon=True)
+            self.dispatcher.start()
+        if EVENT_BUS_BACKEND == "postgres" and engine.dialect.name == "postgresql" and self.listener is None:
+            self.listener = threading.Thread(target=self._listen_loop, name="event-listener", daemon=True)
+            self.listener.start()
+        if EVENT_BUS_BACKEND == "unix" and self.listener is None:
+            self.listener = threading.Thread(target=self._hub_loop, name="event-listener", daemon=True)
+            self.listener.start()
+
+    # True when events also reach other processes
+    @property
+    def bridged(self):
+        return self.listener is not None
+
+    def subscribe(self, callback, remote_only=False):
+        token = object()
+        with self.lock:
+            self.subscribers[token] = (callback, remote_only)
+
+        def unsubscribe():
+            with self.lock:
+                self.subscribers.pop(token, None)
+        return unsubscribe
+
+    # Never blocks: delivery and NOTIFY happen on the dispatcher thread
+    def publish(self, topic, **payload):
+        self.queue.put({"topic": topic, "origin": self.origin, **payload})
+
+    def _notify(self, event):
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": EVENT_CHANNEL, "payload": json.dumps(event, default=str)})
+                conn.commit()
+        except Exception as ex:
+            _log(f"notify failed: {ex}")
+
+    # Events published while the hub is unreachable are kept, up to EVENT_BUFFER_SIZE, and sent on reconnect
+    def _send_to_hub(self, event):
+        line = json.dumps(event, default=str).encode() + b"\n"
+        with self.hub_lock:
+            if self.hub is None:
+                self.unsent.append(line)
+                return
+            try:
+                self.hub.sendall(line)
+            except OSError as ex:
+                _log(f"hub send failed, keeping the event for the reconnect: {ex}")
+                self.unsent.append(line)
+
+    def _dispatch_loop(self):
+        while True:
+            event = self.queue.get()
+            remote = event["origin"] != self.origin
+            if not remote and self.listener is not None:
+                if EVENT_BUS_BACKEND == "unix":
+                    self._send_to_hub(event)
+                else:
+                    self._notify(event)
+            with self.lock:
+                subscribers = list(self.subscribers.values())
+            for callback, remote_only in subscribers:
+                if remote_only and not remote:
+                    continue
+                try:
+                    callback(event)
+                except Exception as ex:
+                    _log(f"subscriber failed on {event['topic']}: {ex}")
+
+    def _listen_loop(self):
+        while True:
+            try:
+                with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                    conn.execute(text(f"LISTEN {EVENT_CHANNEL}"))
+                    notifications = conn.connection.driver_connection.notifications
+                    while True:
+                        # pg8000 only reads notifications while it talks to the server
+                        conn.execute(text("SELECT 1"))
+                        while notifications:
+                            _, _, payload = notifications.popleft()
+                            event = json.loads(payload)
+                            if event.get("origin") != self.origin:
+                                self.queue.put(event)
+                        time.sleep(EVENT_POLL_SECONDS)
+            except Exception as ex:
+                _log(f"listener reconnecting after error: {ex}")
+                time.sleep(1)
+
+    # One JSON event per line; the hub passes every line on to the other workers
+    def _hub_loop(self):
+        connected_before = False
+        while True:
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as hub:
+                    hub.connect(EVENT_SOCKET)
+                    with self.hub_lock:
+                        while self.unsent:
+                            hub.sendall(self.unsent[0])
+                            self.unsent.popleft()
+                        self.hub = hub
+                    # Whatever the other workers published meanwhile never reached this one
+                    if connected_before:
+                        self.queue.put({"topic": RESYNC, "origin": None})
+                    connected_before = True
+                    with hub.makefile("rb") as lines:
+                        for line in lines:
+                            event = json.loads(line)
+                            if event.get("origin") != self.origin:
+                                self.queue.put(event)
+                raise ConnectionError("hub closed the connection")
+            except Exception as ex:
+                with self.hub_lock:
+                    self.hub = None
+                _log(f"hub connection lost, reconnecting: {ex}")
+                time.sleep(1)
+
+bus = EventBus()
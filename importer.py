@@ -0,0 +1,155 @@
+import csv
+import datetime
+import io
+import uuid
+from sqlalchemy import insert
+
+from config import TARGET_TIMEZONE, DATE_FORMAT, IMPORT_BATCH_SIZE, PASS_CACHE_SIZE
+from database import engine, SessionLocal, Registered
+from mailer import mailer
+from passes import render_passes
+
+MAX_REPORTED_ERRORS = 50
+
+REQUIRED_COLUMNS = ("name", "surname", "company", "visitors", "host", "date")
+COLUMN_ALIASES = {"company_name": "company", "visitors_count": "visitors", "visit_date": "date", "e-mail": "email"}
+COPY_COLUMNS = ("qr_id", "name", "surname", "company_name", "visitors_count", "host", "visit_date", "registration_time")
+
+def _normalize_header(header):
+    key = (header or "").strip().lower().replace(" ", "_")
+    return COLUMN_ALIASES.get(key, key)
+
+def iter_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(f, dialect)
+        headers = [_normalize_header(h) for h in next(reader, [])]
+        # A quoted value can span lines, so a row starts on the line after the previous one ended
+        line_number = reader.line_num + 1
+        for values in reader:
+            if any(v.strip() for v in values):
+                yield line_number, dict(zip(headers, values))
+            line_number = reader.line_num + 1
+
+def iter_xlsx(path):
+    try:
+        import openpyxl
+    except ImportError:
+        raise ValueError("XLSX import requires the openpyxl package, please upload a CSV file.")
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = [_normalize_header(str(h) if h is not None else "") for h in next(rows, ())]
+        for line_number, values in enumerate(rows, start=2):
+            if any(v is not None and str(v).strip() for v in values):
+                yield line_number, {h: "" if v is None else v for h, v in zip(headers, values)}
+    finally:
+        workbook.close()
+
+# Yields (line number in the file, row); blank lines are skipped but still counted
+def iter_rows(path):
+    if path.lower().endswith(".xlsx"):
+        return iter_xlsx(path)
+    return iter_csv(path)
+
+def _parse_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    value = str(value).strip()
+    for fmt in (DATE_FORMAT, "%Y-%m-%d"):
+        try:
+            return datetime.datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"invalid visit date '{value}', expected dd.mm.YYYY")
+
+def validate_row(row):
+    missing = [c for c in REQUIRED_COLUMNS if not str(row.get(c, "")).strip()]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    try:
+        visitors = int(str(row["visitors"]).strip())
+    except ValueError:
+        raise ValueError("visitors count must be a number")
+    if visitors < 1:
+        raise ValueError("visitors count must be positive")
+    email = str(row.get("email", "") or "").strip()
+    if email and "@" not in email:
+        raise ValueError(f"invalid email '{email}'")
+    return {
+        "qr_id": str(uuid.uuid4()),
+        "name": str(row["name"]).strip(),
+        "surname": str(row["surname"]).strip(),
+        "company_name": str(row["company"]).strip(),
+        "visitors_count": visitors,
+        "host": str(row["host"]).strip(),
+        "visit_date": _parse_date(row["date"]),
+    }, email
+
+def _copy_batch(db, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[c] for c in COPY_COLUMNS])
+    cursor = db.connection().connection.cursor()
+    cursor.execute(f"COPY {Registered.__tablename__} ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", stream=io.BytesIO(buffer.getvalue().encode("utf-8")))
+
+def _insert_batch(db, rows):
+    if engine.dialect.name == "postgresql" and engine.dialect.driver == "pg8000":
+        _copy_batch(db, rows)
+    else:
+        db.execute(insert(Registered), rows)
+
+def _mail_data(row):
+    return {
+        "qr_id": row["qr_id"], "name": row["name"], "surname": row["surname"], "company": row["company_name"],
+        "host": row["host"], "date": row["visit_date"].strftime(DATE_FORMAT), "visitors": row["visitors_count"],
+    }
+
+def import_visitors(path, send_emails=True, batch_size=IMPORT_BATCH_SIZE):
+    result = {"imported": 0, "emails": 0, "errors": [], "error_count": 0}
+    db = SessionLocal()
+    try:
+        batch, emails, group = [], [], []
+        registration_time = datetime.datetime.now(TARGET_TIMEZONE)
+        for line_number, row in iter_rows(path):
+            try:
+                record, email = validate_row(row)
+            except ValueError as ex:
+                result["error_count"] += 1
+                if len(result["errors"]) < MAX_REPORTED_ERRORS:
+                    result["errors"].append(f"Row {line_number}: {ex}")
+                continue
+            record["registration_time"] = registration_time
+            batch.append(record)
+            if email and send_emails:
+                emails.append((email, _mail_data(record)))
+                if len(group) < PASS_CACHE_SIZE:
+                    group.append(emails[-1][1])
+            if len(batch) >= batch_size:
+                _insert_batch(db, batch)
+                result["emails"] += mailer.enqueue_many(emails, db=db)
+                result["imported"] += len(batch)
+                batch, emails = [], []
+        if batch:
+            _insert_batch(db, batch)
+            result["emails"] += mailer.enqueue_many(emails, db=db)
+            result["imported"] += len(batch)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    if result["emails"]:
+        # Rendered across processes before the mail workers wake, they then find the passes cached
+        render_passes(group)
+        mailer.wake()
+    return result
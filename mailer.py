@@ -0,0 +1,344 @@
+import datetime
+import threading
+import time
+from sqlalchemy import Column, Integer, String, DateTime, Text, insert, update, or_
+
+from config import (
+    SMTP_SERVER, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, SMTP_FROM, SMTP_STARTTLS, TARGET_TIMEZONE,
+    MAIL_WORKERS, MAIL_MAX_ATTEMPTS, MAIL_RETRY_BASE_SECONDS, MAIL_CONNECTION_IDLE_SECONDS, MAIL_CONNECTION_PROBE_SECONDS,
+    MAIL_CLAIM_TIMEOUT_SECONDS,
+)
+from database import Base, SessionLocal
+from events import bus, EMAIL_STATUS
+from passes import render_pass_pdf
+from metrics import timer, STAGE_SECONDS
+
+QUEUED, SENDING, SENT, FAILED = "queued", "sending", "sent", "failed"
+FINISH_RETRIES = 5
+
+EMAIL_HTML = "<html><body><p>Hello,</p><p>In attachemts is your guest pass.</p><p>Company Name</p><p>Company Adress</p><p>Company Adress2</p><p>Opening Hours:</p><p>Monday–Friday, 08:00–16:00 (EET)</p><p>Best regards,<br>Visitors Registration system</p></body></html>"
+
+# --- Outbox ---
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    id = Column(Integer, primary_key=True, index=True)
+    recipient = Column(String, nullable=False)
+    qr_id = Column(String, nullable=False)
+    name = Column(String, nullable=False)
+    surname = Column(String, nullable=False)
+    company_name = Column(String, nullable=True)
+    host = Column(String, nullable=False)
+    visit_date = Column(String, nullable=False)
+    visitors_count = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, default=QUEUED, index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime(timezone=True), default=lambda: datetime.datetime.now(TARGET_TIMEZONE))
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.datetime.now(TARGET_TIMEZONE))
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+
+def _log(message):
+    print(f"[mailer] {message}", flush=True)
+
+# The email and SMTP modules are only imported once there is something to send
+def build_message(recipient, data):
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    from email.mime.base import MIMEBase
+    from email import encoders
+
+    msg = MIMEMultipart()
+    msg["From"] = SMTP_FROM
+    msg["To"] = recipient
+    msg["Subject"] = f"Guest pass for {data['name']} {data['surname']}"
+    msg.attach(MIMEText(EMAIL_HTML, "html"))
+
+    part = MIMEBase("application", "pdf")
+    part.set_payload(render_pass_pdf(data))
+    encoders.encode_base64(part)
+    part.add_header("Content-Disposition", f"attachment; filename=pass_{data['surname']}.pdf")
+    msg.attach(part)
+    return msg
+
+def _row_data(row):
+    return {
+        "qr_id": row.qr_id, "name": row.name, "surname": row.surname, "company": row.company_name,
+        "host": row.host, "date": row.visit_date, "visitors": row.visitors_count,
+    }
+
+# --- SMTP connection kept open between messages ---
+class SmtpConnection:
+    def __init__(self):
+        self.server = None
+        self.last_used = 0.0
+
+    def get(self):
+        import smtplib
+
+        idle = time.monotonic() - self.last_used
+        if self.server is not None and idle > MAIL_CONNECTION_IDLE_SECONDS:
+            self.close()
+        # A connection in steady use is trusted, one that sat idle may have been dropped by the server
+        if self.server is not None and idle > MAIL_CONNECTION_PROBE_SECONDS:
+            try:
+                if self.server.noop()[0] != 250:
+                    self.close()
+            except smtplib.SMTPException:
+                self.close()
+        if self.server is None:
+            server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=30)
+            try:
+                if SMTP_STARTTLS:
+                    server.starttls()
+                if SMTP_USER:
+                    server.login(SMTP_USER, SMTP_PASSWORD)
+            except Exception:
+                server.close()
+                raise
+            self.server = server
+        return self.server
+
+    def send(self, msg):
+        self.get().send_message(msg)
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                self.server.close()
+        self.server = None
+
+# --- Delivery workers ---
+class Mailer:
+    def __init__(self, workers=MAIL_WORKERS):
+        self.workers = workers
+        self.wakeup = threading.Condition()
+        self.listeners = {}
+        self.listeners_lock = threading.Lock()
+        self.threads = []
+        self.stopping = False
+        self.recovered_at = 0.0
+        bus.subscribe(self._remote_status, remote_only=True)
+
+    def start(self):
+        if self.threads:
+            return
+        self.requeue_stale()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"mailer-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.stopping = True
+        with self.wakeup:
+            self.wakeup.notify_all()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        self.stopping = False
+
+    def enqueue(self, recipient, data, on_status=None):
+        db = SessionLocal()
+        try:
+            message = EmailOutbox(
+                recipient=recipient, qr_id=data["qr_id"], name=data["name"], surname=data["surname"],
+                company_name=data["company"], host=data["host"], visit_date=data["date"],
+                visitors_count=int(data["visitors"]),
+            )
+            db.add(message)
+            db.flush()
+            message_id = message.id
+            # Registered before the commit makes the message visible, so no worker can report before it exists
+            if on_status:
+                with self.listeners_lock:
+                    self.listeners[message_id] = on_status
+            try:
+                db.commit()
+            except Exception:
+                with self.listeners_lock:
+                    self.listeners.pop(message_id, None)
+                raise
+        finally:
+            db.close()
+        self.wake()
+        return message_id
+
+    def enqueue_many(self, items, db=None):
+        now = datetime.datetime.now(TARGET_TIMEZONE)
+        rows = [
+            {
+                "recipient": recipient, "qr_id": data["qr_id"], "name": data["name"], "surname": data["surname"],
+                "company_name": data["company"], "host": data["host"], "visit_date": data["date"],
+                "visitors_count": int(data["visitors"]), "status": QUEUED, "attempts": 0,
+                "next_attempt_at": now, "created_at": now,
+            }
+            for recipient, data in items
+        ]
+        if not rows:
+            return 0
+        if db is not None:
+            db.execute(insert(EmailOutbox), rows)
+            return len(rows)
+        db = SessionLocal()
+        try:
+            db.execute(insert(EmailOutbox), rows)
+            db.commit()
+        finally:
+            db.close()
+        self.wake()
+        return len(rows)
+
+    def wake(self):
+        with self.wakeup:
+            self.wakeup.notify_all()
+
+    def status(self, message_id):
+        db = SessionLocal()
+        try:
+            message = db.get(EmailOutbox, message_id)
+            return (message.status, message.last_error) if message else (None, None)
+        finally:
+            db.close()
+
+    def _notify(self, message_id, status, error=None, forward=True):
+        with self.listeners_lock:
+            callback = self.listeners.get(message_id)
+            if status in (SENT, FAILED):
+                self.listeners.pop(message_id, None)
+        if callback:
+            try:
+                callback(message_id, status, error)
+            except Exception:
+                pass
+        # The page waiting for it may be in another worker process
+        elif forward and bus.bridged:
+            bus.publish(EMAIL_STATUS, message_id=message_id, status=status, error=error)
+
+    def _remote_status(self, event):
+        if event["topic"] == EMAIL_STATUS:
+            self._notify(event["message_id"], event["status"], event["error"], forward=False)
+
+    # A claim older than MAIL_CLAIM_TIMEOUT_SECONDS belongs to a process that died mid-send,
+    # so every process can run this without taking messages a live worker is still sending
+    def requeue_stale(self):
+        self.recovered_at = time.monotonic()
+        stale = datetime.datetime.now(TARGET_TIMEZONE) - datetime.timedelta(seconds=MAIL_CLAIM_TIMEOUT_SECONDS)
+        db = SessionLocal()
+        try:
+            requeued = (
+                db.query(EmailOutbox)
+                .filter(EmailOutbox.status == SENDING, or_(EmailOutbox.claimed_at.is_(None), EmailOutbox.claimed_at < stale))
+                .update({EmailOutbox.status: QUEUED}, synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+        if requeued:
+            _log(f"requeued {requeued} messages with a stale claim")
+        return requeued
+
+    def _claim(self):
+        db = SessionLocal()
+        try:
+            now = datetime.datetime.now(TARGET_TIMEZONE)
+            message = (
+                db.query(EmailOutbox)
+                .filter(EmailOutbox.status == QUEUED, EmailOutbox.next_attempt_at <= now)
+                .order_by(EmailOutbox.next_attempt_at)
+                .with_for_update(skip_locked=True)
+                .first()
+            )
+            if not message:
+                upcoming = db.query(EmailOutbox.next_attempt_at).filter(EmailOutbox.status == QUEUED).order_by(EmailOutbox.next_attempt_at).first()
+                db.rollback()
+                return None, upcoming[0] if upcoming else None
+            result = (message.id, message.recipient, message.attempts + 1, _row_data(message))
+            # Conditional update: SQLite ignores FOR UPDATE, so two workers can select the same row
+            claimed = db.execute(
+                update(EmailOutbox).where(EmailOutbox.id == message.id, EmailOutbox.status == QUEUED)
+                .values(status=SENDING, attempts=EmailOutbox.attempts + 1, claimed_at=now)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+            if not claimed:
+                return None, now
+            return result, None
+        finally:
+            db.close()
+
+    def _finish(self, message_id, attempts, error):
+        db = SessionLocal()
+        try:
+            message = db.get(EmailOutbox, message_id)
+            now = datetime.datetime.now(TARGET_TIMEZONE)
+            if error is None:
+                message.status, message.sent_at, message.last_error = SENT, now, None
+            elif attempts >= MAIL_MAX_ATTEMPTS:
+                message.status, message.last_error = FAILED, error
+            else:
+                message.status, message.last_error = QUEUED, error
+                message.next_attempt_at = now + datetime.timedelta(seconds=MAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+            db.commit()
+            return message.status
+        finally:
+            db.close()
+
+    # The outcome has to reach the outbox: a message left in SENDING is requeued and sent again
+    # once its claim is stale, so retry for a while before giving up and reporting it anyway
+    def _record(self, message_id, attempts, error):
+        for retry in range(FINISH_RETRIES):
+            try:
+                return self._finish(message_id, attempts, error)
+            except Exception as ex:
+                _log(f"could not record the outcome of message {message_id} ({ex}), attempt {retry + 1} of {FINISH_RETRIES}")
+                if retry + 1 < FINISH_RETRIES:
+                    time.sleep(min(2 ** retry, 10))
+        _log(f"message {message_id} stays in sending until its claim is stale")
+        if error is None:
+            return SENT
+        return FAILED if attempts >= MAIL_MAX_ATTEMPTS else QUEUED
+
+    def _worker(self):
+        connection = SmtpConnection()
+        try:
+            while not self.stopping:
+                try:
+                    claimed, upcoming = self._claim()
+                except Exception:
+                    claimed, upcoming = None, None
+                if claimed is None:
+                    if time.monotonic() - self.recovered_at > MAIL_CLAIM_TIMEOUT_SECONDS / 2:
+                        try:
+                            self.requeue_stale()
+                        except Exception:
+                            pass
+                    timeout = 5.0
+                    if upcoming is not None:
+                        if upcoming.tzinfo is None:
+                            upcoming = upcoming.replace(tzinfo=TARGET_TIMEZONE)
+                        timeout = min(timeout, max((upcoming - datetime.datetime.now(TARGET_TIMEZONE)).total_seconds(), 0.05))
+                    with self.wakeup:
+                        if not self.stopping:
+                            self.wakeup.wait(timeout)
+                    continue
+
+                message_id, recipient, attempts, data = claimed
+                self._notify(message_id, SENDING)
+                error = None
+                try:
+                    with timer(STAGE_SECONDS, stage="mail_build"):
+                        msg = build_message(recipient, data)
+                    with timer(STAGE_SECONDS, stage="smtp_send"):
+                        connection.send(msg)
+                except Exception as ex:
+                    connection.close()
+                    error = str(ex) or ex.__class__.__name__
+                self._notify(message_id, self._record(message_id, attempts, error), error)
+        finally:
+            connection.close()
+
+mailer = Mailer()
@@ -0,0 +1,208 @@
+import bisect
+import contextvars
+import functools
+import inspect
+import re
+import threading
+import time
+from sqlalchemy import event
+
+from config import METRICS_ENABLED, METRICS_QUERY_WARN
+
+HANDLER_SECONDS = "handler_seconds"
+HANDLER_QUERIES = "handler_db_queries"
+STAGE_SECONDS = "stage_seconds"
+DB_QUERY_SECONDS = "db_query_seconds"
+
+TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+HELP = {
+    HANDLER_SECONDS: "Time spent in page and API handlers",
+    HANDLER_QUERIES: "Database queries issued per handler call",
+    STAGE_SECONDS: "Time spent in handler sub-stages",
+    DB_QUERY_SECONDS: "Time per database statement",
+}
+
+# Queries issued by the handler currently running in this task or thread
+_handler_queries = contextvars.ContextVar("handler_queries", default=None)
+
+def _log(message):
+    print(f"[metrics] {message}", flush=True)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    # Estimated from the buckets, like Prometheus' histogram_quantile
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                low = self.buckets[i - 1] if i > 0 else 0.0
+                high = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return low + (high - low) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+# --- Process-wide histograms keyed by (metric, labels), plus gauges read on scrape ---
+class Registry:
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.gauges = {}
+
+    def observe(self, name, value, buckets=TIME_BUCKETS, **labels):
+        key = (name, tuple(labels.items()))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    # Values read on every scrape; kind="counter" for values that only grow
+    def gauge(self, name, read, help_text="", kind="gauge"):
+        self.gauges[name] = (read, help_text, kind)
+
+    def series(self, name):
+        with self.lock:
+            return [(dict(labels), histogram) for (metric, labels), histogram in self.histograms.items() if metric == name]
+
+    def render(self):
+        lines = []
+        with self.lock:
+            by_name = {}
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                by_name.setdefault(name, []).append((labels, histogram))
+            for name, series in by_name.items():
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in series:
+                    label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                    prefix = label_text + "," if label_text else ""
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {histogram.count}')
+                    lines.append(f"{name}_sum{{{label_text}}} {histogram.sum}")
+                    lines.append(f"{name}_count{{{label_text}}} {histogram.count}")
+        for name, (read, help_text, kind) in sorted(self.gauges.items()):
+            try:
+                value = read()
+            except Exception as ex:
+                _log(f"gauge {name} failed: {ex}")
+                continue
+            lines.append(f"# HELP {name} {help_text or name}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+# --- Timing helpers ---
+# A plain class rather than @contextmanager: stages sit on hot paths and a generator per use costs more
+class timer:
+    __slots__ = ("name", "labels", "started")
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter() if registry.enabled else None
+
+    def __exit__(self, *exc):
+        if self.started is not None:
+            registry.observe(self.name, time.perf_counter() - self.started, **self.labels)
+
+def _finish_handler(handler, started, queries, token):
+    _handler_queries.reset(token)
+    registry.observe(HANDLER_SECONDS, time.perf_counter() - started, handler=handler)
+    registry.observe(HANDLER_QUERIES, queries[0], buckets=COUNT_BUCKETS, handler=handler)
+    if queries[0] >= METRICS_QUERY_WARN:
+        _log(f"{handler} issued {queries[0]} queries, possible N+1")
+
+def timed(handler):
+    def decorate(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not registry.enabled:
+                    return await func(*args, **kwargs)
+                queries = [0]
+                token = _handler_queries.set(queries)
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    _finish_handler(handler, started, queries, token)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return func(*args, **kwargs)
+            queries = [0]
+            token = _handler_queries.set(queries)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _finish_handler(handler, started, queries, token)
+        return wrapper
+    return decorate
+
+# --- SQLAlchemy hooks: per-statement time and per-handler query counts ---
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if registry.enabled:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+# Statements are labelled by verb and first table ("SELECT registered"), which keeps the label set
+# small and still tells apart the queries of different call sites.
+# Compiled statements are cached by SQLAlchemy, so the same strings come back on every call
+STATEMENT_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|JOIN)\s+"?(\w+)', re.I)
+_labels = {}
+
+def _statement_label(statement):
+    label = _labels.get(statement)
+    if label is None:
+        words = statement.split(None, 1)
+        verb = words[0].upper() if words else ""
+        table = STATEMENT_TABLE.search(statement)
+        label = _labels[statement] = f"{verb} {table.group(1)}" if table else verb
+        if len(_labels) > 10000:
+            _labels.clear()
+    return label
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    registry.observe(DB_QUERY_SECONDS, time.perf_counter() - started.pop(), statement=_statement_label(statement))
+    queries = _handler_queries.get()
+    if queries is not None:
+        queries[0] += 1
+
+def _handle_error(context):
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+def instrument_engine(engine):
+    engine = getattr(engine, "sync_engine", engine)
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
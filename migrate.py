@@ -0,0 +1,160 @@
+import os
+import sys
+import time
+from sqlalchemy import inspect, text, Date, DateTime
+
+from database import engine
+import partitions
+
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "10000"))
+
+def _log(message):
+    print(f"[migrate] {message}", flush=True)
+
+def _id_range(conn):
+    low, high = conn.execute(text("SELECT min(id), max(id) FROM registered")).one()
+    return low or 0, high or 0
+
+def _create_index_concurrently(sql):
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # pg8000 opens a transaction for the pool's pre-ping, CONCURRENTLY refuses to run inside it
+        conn.connection.dbapi_connection.rollback()
+        conn.execute(text(sql))
+
+# --- registered.visit_date: 'dd.mm.YYYY' string -> DATE ---
+def visit_date_to_date(batch_size=MIGRATION_BATCH_SIZE):
+    columns = {c["name"]: c for c in inspect(engine).get_columns("registered")}
+    if engine.dialect.name == "postgresql":
+        if not isinstance(columns["visit_date"]["type"], Date):
+            _migrate_visit_date_postgresql(batch_size, "visit_date_new" in columns)
+        _create_index_concurrently("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_registered_visit_date_qr_id ON registered (visit_date, qr_id)")
+    else:
+        _migrate_visit_date_generic(batch_size)
+        with engine.begin() as conn:
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_registered_visit_date_qr_id ON registered (visit_date, qr_id)"))
+
+def _migrate_visit_date_postgresql(batch_size, resume):
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        if not resume:
+            conn.execute(text("ALTER TABLE registered ADD COLUMN visit_date_new date"))
+        low, high = _id_range(conn)
+
+    # Backfill in short transactions so only one batch of rows is locked at a time
+    converted = 0
+    for start in range(low, high + 1, batch_size):
+        with engine.begin() as conn:
+            converted += conn.execute(
+                text("UPDATE registered SET visit_date_new = to_date(visit_date, 'DD.MM.YYYY') WHERE id >= :lo AND id < :hi AND visit_date_new IS NULL"),
+                {"lo": start, "hi": start + batch_size},
+            ).rowcount
+    _log(f"visit_date: backfilled {converted} rows in {time.perf_counter() - started:.1f}s")
+
+    # Rows inserted during the backfill are converted inside the short swap transaction
+    with engine.begin() as conn:
+        conn.execute(text("LOCK TABLE registered IN ACCESS EXCLUSIVE MODE"))
+        conn.execute(text("UPDATE registered SET visit_date_new = to_date(visit_date, 'DD.MM.YYYY') WHERE visit_date_new IS NULL"))
+        conn.execute(text("ALTER TABLE registered DROP COLUMN visit_date"))
+        conn.execute(text("ALTER TABLE registered RENAME COLUMN visit_date_new TO visit_date"))
+        conn.execute(text("ALTER TABLE registered ALTER COLUMN visit_date SET NOT NULL"))
+    _log(f"visit_date: switched to DATE in {time.perf_counter() - started:.1f}s")
+
+def _migrate_visit_date_generic(batch_size):
+    # SQLite keeps the declared type, SQLAlchemy's Date reads ISO 'YYYY-MM-DD' values
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT 1 FROM registered WHERE visit_date LIKE '__.__.____' LIMIT 1")).first() is None:
+            return
+        low, high = _id_range(conn)
+    converted = 0
+    for start in range(low, high + 1, batch_size):
+        with engine.begin() as conn:
+            converted += conn.execute(
+                text(
+                    "UPDATE registered SET visit_date = substr(visit_date, 7, 4) || '-' || substr(visit_date, 4, 2) || '-' || substr(visit_date, 1, 2) "
+                    "WHERE id >= :lo AND id < :hi AND visit_date LIKE '__.__.____'"
+                ),
+                {"lo": start, "hi": start + batch_size},
+            ).rowcount
+    _log(f"visit_date: converted {converted} rows")
+
+# --- Visitor log: keyset index and pg_trgm search indexes ---
+LOG_SEARCH_COLUMNS = ("name", "surname", "company_name", "host")
+
+def visitor_log_indexes():
+    if engine.dialect.name != "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_registered_registration_time_id ON registered (registration_time, id)"))
+        return
+    _create_index_concurrently("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_registered_registration_time_id ON registered (registration_time, id)")
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except Exception as ex:
+        _log(f"pg_trgm is not available, visitor log search will not be indexed: {ex}")
+        return
+    for column in LOG_SEARCH_COLUMNS:
+        _create_index_concurrently(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_registered_{column}_trgm ON registered USING gin ({column} gin_trgm_ops)")
+
+# --- check_in / check_out.event_id for idempotent edge sync ---
+EVENT_ID_TABLES = (("check_in", "check_in_time"), ("check_out", "check_out_time"))
+
+def scan_event_ids():
+    for table, time_column in EVENT_ID_TABLES:
+        columns = {c["name"] for c in inspect(engine).get_columns(table)}
+        with engine.begin() as conn:
+            if "event_id" not in columns:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN event_id VARCHAR"))
+            # Unique indexes on partitioned tables must include the partition key
+            if engine.dialect.name != "postgresql":
+                conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS ux_{table}_event_id ON {table} (event_id, {time_column})"))
+                continue
+            if conn.execute(text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {"name": f"ux_{table}_event_id"}).scalar():
+                continue
+            parts = conn.execute(
+                text("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(:name)"), {"name": table}
+            ).scalars().all()
+            partitioned = conn.execute(text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:name)"), {"name": table}).scalar()
+        if not partitioned:
+            _create_index_concurrently(f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_{table}_event_id ON {table} (event_id, {time_column})")
+            continue
+        # CONCURRENTLY is refused on a partitioned table: build each partition's index, then attach them to an index on the parent alone
+        for part in parts:
+            _create_index_concurrently(f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {part}_event_id ON {part} (event_id, {time_column})")
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS ux_{table}_event_id ON ONLY {table} (event_id, {time_column})"))
+            for part in parts:
+                conn.execute(text(f"ALTER INDEX ux_{table}_event_id ATTACH PARTITION {part}_event_id"))
+        _log(f"{table}: event_id index built on {len(parts)} partitions")
+
+# --- email_outbox.claimed_at for requeueing only stale claims ---
+def outbox_claimed_at():
+    if not inspect(engine).has_table("email_outbox"):
+        return
+    if "claimed_at" not in {c["name"] for c in inspect(engine).get_columns("email_outbox")}:
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE email_outbox ADD COLUMN claimed_at {DateTime(timezone=True).compile(dialect=engine.dialect)}"))
+
+MIGRATIONS = [
+    ("visit_date_to_date", visit_date_to_date),
+    ("visitor_log_indexes", visitor_log_indexes),
+    ("scan_event_ids", scan_event_ids),
+    ("outbox_claimed_at", outbox_claimed_at),
+]
+
+# Long-running conversions, never part of upgrade(): run by name, e.g. `python3 migrate.py partition_events`
+COMMANDS = [
+    ("partition_events", partitions.convert_existing_tables),
+]
+
+def upgrade(only=None):
+    if not inspect(engine).has_table("registered"):
+        return
+    for name, migration in MIGRATIONS:
+        if only is None or name in only:
+            migration()
+    for name, command in COMMANDS:
+        if only is not None and name in only:
+            command()
+
+if __name__ == "__main__":
+    upgrade(sys.argv[1:] or None)
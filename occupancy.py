@@ -0,0 +1,109 @@
+import datetime
+import threading
+import time
+from collections import namedtuple
+from sqlalchemy import select, func, or_
+
+from config import TARGET_TIMEZONE, OCCUPANCY_WINDOW_HOURS
+from database import SessionLocal, Registered, CheckIn, CheckOut
+
+PRUNE_INTERVAL_SECONDS = 60
+
+Occupant = namedtuple("Occupant", "qr_id name surname company_name host visitors_count check_in_time")
+
+def occupants_query(since):
+    last_in = (
+        select(CheckIn.qr_id, func.max(CheckIn.check_in_time).label("last_in"))
+        .where(CheckIn.check_in_time >= since)
+        .group_by(CheckIn.qr_id)
+        .subquery()
+    )
+    last_out = (
+        select(CheckOut.qr_id, func.max(CheckOut.check_out_time).label("last_out"))
+        .where(CheckOut.check_out_time >= since)
+        .group_by(CheckOut.qr_id)
+        .subquery()
+    )
+    return (
+        select(
+            Registered.qr_id, Registered.name, Registered.surname, Registered.company_name,
+            Registered.host, Registered.visitors_count, last_in.c.last_in,
+        )
+        .join(last_in, last_in.c.qr_id == Registered.qr_id)
+        .outerjoin(last_out, last_out.c.qr_id == Registered.qr_id)
+        .where(or_(last_out.c.last_out.is_(None), last_out.c.last_out < last_in.c.last_in))
+    )
+
+def _window_start():
+    return datetime.datetime.now(TARGET_TIMEZONE) - datetime.timedelta(hours=OCCUPANCY_WINDOW_HOURS)
+
+def _aware(moment):
+    return moment.replace(tzinfo=TARGET_TIMEZONE) if moment.tzinfo is None else moment
+
+# --- Visitors currently on site, keyed by qr_id ---
+# Same window as rebuild(): a visitor who never checked out drops off OCCUPANCY_WINDOW_HOURS after checking in
+class Occupancy:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.people = 0
+        self.next_prune = 0.0
+
+    def _prune(self):
+        if time.monotonic() < self.next_prune:
+            return
+        since = _window_start()
+        with self.lock:
+            self.next_prune = time.monotonic() + PRUNE_INTERVAL_SECONDS
+            for qr_id in [qr_id for qr_id, o in self.entries.items() if _aware(o.check_in_time) < since]:
+                self.people -= self.entries.pop(qr_id).visitors_count
+
+    def rebuild(self):
+        since = _window_start()
+        db = SessionLocal()
+        try:
+            rows = db.execute(occupants_query(since)).all()
+        finally:
+            db.close()
+        entries = {row.qr_id: Occupant(*row) for row in rows}
+        with self.lock:
+            self.entries = entries
+            self.people = sum(o.visitors_count for o in entries.values())
+        return len(entries)
+
+    def check_in(self, occupant):
+        with self.lock:
+            previous = self.entries.get(occupant.qr_id)
+            self.people += occupant.visitors_count - (previous.visitors_count if previous else 0)
+            self.entries[occupant.qr_id] = occupant
+
+    def check_out(self, qr_id):
+        with self.lock:
+            previous = self.entries.pop(qr_id, None)
+            if previous:
+                self.people -= previous.visitors_count
+
+    def update_count(self, qr_id, visitors_count):
+        with self.lock:
+            previous = self.entries.get(qr_id)
+            if previous:
+                self.people += visitors_count - previous.visitors_count
+                self.entries[qr_id] = previous._replace(visitors_count=visitors_count)
+
+    def get(self, qr_id):
+        self._prune()
+        with self.lock:
+            return self.entries.get(qr_id)
+
+    def counts(self):
+        self._prune()
+        with self.lock:
+            return self.people, len(self.entries)
+
+    def snapshot(self):
+        self._prune()
+        with self.lock:
+            occupants = list(self.entries.values())
+        return sorted(occupants, key=lambda o: (o.surname.lower(), o.name.lower()))
+
+occupancy = Occupancy()
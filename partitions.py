@@ -0,0 +1,293 @@
+import csv
+import datetime
+import gzip
+import os
+import re
+import threading
+from sqlalchemy import text, inspect
+from sqlalchemy.schema import CreateTable, CreateIndex
+
+from config import TARGET_TIMEZONE, ARCHIVE_DIR, PARTITION_MONTHS_AHEAD, PARTITION_RETENTION_MONTHS, PARTITION_CONVERT_BATCH_SIZE
+from database import engine, CheckIn, CheckOut, AccessCard
+
+# table -> timestamp column used as the monthly range key
+PARTITIONED_TABLES = {
+    CheckIn.__table__: "check_in_time",
+    CheckOut.__table__: "check_out_time",
+    AccessCard.__table__: "issue_time",
+}
+MAINTENANCE_INTERVAL_SECONDS = 24 * 3600
+
+def _log(message):
+    print(f"[partitions] {message}", flush=True)
+
+def enabled():
+    return engine.dialect.name == "postgresql"
+
+def _month_start(day):
+    return datetime.datetime(day.year, day.month, 1, tzinfo=TARGET_TIMEZONE)
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+def _partition_name(table, month):
+    return f"{table.name}_y{month.year}m{month.month:02d}"
+
+def _is_partitioned(conn, table):
+    return conn.execute(text("SELECT c.relkind = 'p' FROM pg_class c WHERE c.oid = to_regclass(:name)"), {"name": table.name}).scalar()
+
+# --- Parent tables, built from the model definitions ---
+def _create_parent(conn, table, column, default=True):
+    ddl = str(CreateTable(table).compile(dialect=conn.dialect)).rstrip()
+    ddl = ddl.replace("PRIMARY KEY (id)", f"PRIMARY KEY (id, {column})")
+    conn.execute(text(f"{ddl} PARTITION BY RANGE ({column})"))
+    for index in table.indexes:
+        index.create(conn)
+    if default:
+        conn.execute(text(f"CREATE TABLE {table.name}_default PARTITION OF {table.name} DEFAULT"))
+
+def create_partitioned_tables():
+    if not enabled():
+        return
+    with engine.begin() as conn:
+        for table, column in PARTITIONED_TABLES.items():
+            if not inspect(conn).has_table(table.name):
+                _create_parent(conn, table, column)
+                _log(f"created partitioned table {table.name}")
+    ensure_partitions()
+
+def _create_partition(conn, table, month):
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {_partition_name(table, month)} PARTITION OF {table.name} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+    ))
+
+def ensure_partitions(months_ahead=PARTITION_MONTHS_AHEAD):
+    if not enabled():
+        return
+    current = _month_start(datetime.datetime.now(TARGET_TIMEZONE))
+    with engine.begin() as conn:
+        for table, column in PARTITIONED_TABLES.items():
+            if _is_partitioned(conn, table):
+                converting = inspect(conn).has_table(_legacy_name(table))
+                for i in range(months_ahead + 1):
+                    month = _add_months(current, i)
+                    # A month still held by a table being converted gets its partition when the rows move
+                    if converting and conn.execute(text(
+                        f"SELECT 1 FROM {_legacy_name(table)} WHERE {column} >= :start AND {column} < :end LIMIT 1"
+                    ), {"start": month, "end": _add_months(month, 1)}).first():
+                        continue
+                    _create_partition(conn, table, month)
+
+# --- Conversion of tables created by older versions: `python3 migrate.py partition_events` ---
+# The old table becomes the default partition of a new parent in one short transaction, then its rows
+# move month by month into partitions of their own, PARTITION_CONVERT_BATCH_SIZE rows per transaction.
+# Rows of the month the conversion ran in stay behind until the command is run again after it ends.
+def _legacy_name(table):
+    return f"{table.name}_legacy"
+
+def _autocommit(sql):
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # pg8000 opens a transaction for the pool's pre-ping, CONCURRENTLY refuses to run inside it
+        conn.connection.dbapi_connection.rollback()
+        conn.execute(text(sql))
+
+def _has_constraint(conn, table_name, name):
+    return conn.execute(
+        text("SELECT 1 FROM pg_constraint WHERE conrelid = to_regclass(:table) AND conname = :name"), {"table": table_name, "name": name}
+    ).first() is not None
+
+# Everything ATTACH would otherwise check or build under its lock: same columns, matching indexes, a non-null key
+def _prepare_legacy(table, column, upper):
+    legacy = _legacy_name(table)
+    with engine.begin() as conn:
+        columns = {c["name"] for c in inspect(conn).get_columns(table.name)}
+        for c in table.columns:
+            if c.name not in columns:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {c.name} {c.type.compile(dialect=conn.dialect)}"))
+        low, high = conn.execute(text(f"SELECT COALESCE(min(id), 0), COALESCE(max(id), 0) FROM {table.name}")).one()
+    for start in range(low, high + 1, PARTITION_CONVERT_BATCH_SIZE):
+        with engine.begin() as conn:
+            conn.execute(
+                text(f"UPDATE {table.name} SET {column} = now() WHERE id >= :lo AND id < :hi AND {column} IS NULL"),
+                {"lo": start, "hi": start + PARTITION_CONVERT_BATCH_SIZE},
+            )
+    for index in table.indexes:
+        _autocommit(str(CreateIndex(index).compile(dialect=engine.dialect)).replace(" INDEX ", " INDEX CONCURRENTLY IF NOT EXISTS ", 1))
+    _autocommit(f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {legacy}_key ON {table.name} (id, {column})")
+    # NOT VALID applies to new rows at once, VALIDATE then scans the old ones without blocking writes
+    with engine.begin() as conn:
+        if not _has_constraint(conn, table.name, f"{legacy}_range"):
+            conn.execute(text(f"ALTER TABLE {table.name} ADD CONSTRAINT {legacy}_range CHECK ({column} IS NOT NULL AND {column} < '{upper.isoformat()}') NOT VALID"))
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table.name} VALIDATE CONSTRAINT {legacy}_range"))
+
+def _attach_legacy(table, column, upper):
+    legacy = _legacy_name(table)
+    current = _month_start(datetime.datetime.now(TARGET_TIMEZONE))
+    with engine.begin() as conn:
+        conn.execute(text(f"LOCK TABLE {table.name} IN ACCESS EXCLUSIVE MODE"))
+        conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {legacy}"))
+        indexes = conn.execute(
+            text("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :name"), {"name": legacy}
+        ).scalars().all()
+        for index in indexes:
+            if not index.startswith(legacy):
+                conn.execute(text(f"ALTER INDEX {index} RENAME TO {legacy}_{index}"))
+        # The validated CHECK proves it, so neither this nor the ATTACH below scans the table
+        conn.execute(text(f"ALTER TABLE {legacy} ALTER COLUMN {column} SET NOT NULL"))
+        # A partition's primary key must match the parent's (id, column), the prepared unique index becomes it
+        primary = conn.execute(
+            text("SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:name) AND contype = 'p'"), {"name": legacy}
+        ).scalar()
+        conn.execute(text(
+            (f"ALTER TABLE {legacy} DROP CONSTRAINT {primary}, " if primary else f"ALTER TABLE {legacy} ")
+            + f"ADD CONSTRAINT {legacy}_pkey PRIMARY KEY USING INDEX {legacy}_key"
+        ))
+        _create_parent(conn, table, column, default=False)
+        conn.execute(text(f"ALTER TABLE {table.name} ATTACH PARTITION {legacy} DEFAULT"))
+        month = upper
+        while month <= _add_months(current, PARTITION_MONTHS_AHEAD) or month == upper:
+            _create_partition(conn, table, month)
+            month = _add_months(month, 1)
+        conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), COALESCE((SELECT max(id) FROM {table.name}), 0) + 1, false)"))
+    _log(f"{table.name} is partitioned, {legacy} is its default partition until its rows are moved")
+
+def _move_month(table, column, month):
+    legacy = _legacy_name(table)
+    partition = _partition_name(table, month)
+    following = _add_months(month, 1)
+    upper = _add_months(_month_start(datetime.datetime.now(TARGET_TIMEZONE)), 1)
+    columns = ", ".join(c.name for c in table.columns)
+    # From here new rows for this month are refused (edge journals retry them) until its partition is attached
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {legacy} DROP CONSTRAINT IF EXISTS {legacy}_range_next"))
+        conn.execute(text(
+            f"ALTER TABLE {legacy} ADD CONSTRAINT {legacy}_range_next "
+            f"CHECK ({column} >= '{following.isoformat()}' AND {column} < '{upper.isoformat()}') NOT VALID"
+        ))
+        if not inspect(conn).has_table(partition):
+            conn.execute(text(f"CREATE TABLE {partition} (LIKE {table.name} INCLUDING DEFAULTS INCLUDING INDEXES)"))
+            conn.execute(text(
+                f"ALTER TABLE {partition} ADD CONSTRAINT {partition}_range "
+                f"CHECK ({column} >= '{month.isoformat()}' AND {column} < '{following.isoformat()}')"
+            ))
+    moved = 0
+    while True:
+        with engine.begin() as conn:
+            count = conn.execute(text(
+                f"WITH moved AS (DELETE FROM {legacy} WHERE ctid = ANY(ARRAY(SELECT ctid FROM {legacy} WHERE {column} < :following LIMIT :limit)) "
+                f"RETURNING {columns}) INSERT INTO {partition} ({columns}) SELECT {columns} FROM moved"
+            ), {"following": following, "limit": PARTITION_CONVERT_BATCH_SIZE}).rowcount
+        if not count:
+            break
+        moved += count
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {legacy} VALIDATE CONSTRAINT {legacy}_range_next"))
+    # Both CHECK constraints let ATTACH skip scanning the new partition and the default one
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {legacy} DROP CONSTRAINT {legacy}_range"))
+        conn.execute(text(f"ALTER TABLE {legacy} RENAME CONSTRAINT {legacy}_range_next TO {legacy}_range"))
+        conn.execute(text(f"ALTER TABLE {table.name} ATTACH PARTITION {partition} FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"))
+    _log(f"moved {moved} rows into {partition}")
+
+def _drop_legacy(table):
+    legacy = _legacy_name(table)
+    current = _month_start(datetime.datetime.now(TARGET_TIMEZONE))
+    with engine.begin() as conn:
+        conn.execute(text(f"LOCK TABLE {table.name} IN ACCESS EXCLUSIVE MODE"))
+        if conn.execute(text(f"SELECT 1 FROM {legacy} LIMIT 1")).first() is not None:
+            _log(f"rows of this month stay in {legacy}, run the conversion again next month to finish it")
+            return
+        conn.execute(text(f"ALTER TABLE {table.name} DETACH PARTITION {legacy}"))
+        conn.execute(text(f"DROP TABLE {legacy}"))
+        for i in range(PARTITION_MONTHS_AHEAD + 1):
+            _create_partition(conn, table, _add_months(current, i))
+        conn.execute(text(f"CREATE TABLE {table.name}_default PARTITION OF {table.name} DEFAULT"))
+    _log(f"converted {table.name}")
+
+def convert_existing_tables():
+    if not enabled():
+        return
+    for table, column in PARTITIONED_TABLES.items():
+        with engine.connect() as conn:
+            if not inspect(conn).has_table(table.name):
+                continue
+            partitioned = _is_partitioned(conn, table)
+            converting = inspect(conn).has_table(_legacy_name(table))
+        if not partitioned:
+            upper = _add_months(_month_start(datetime.datetime.now(TARGET_TIMEZONE)), 1)
+            _prepare_legacy(table, column, upper)
+            _attach_legacy(table, column, upper)
+        elif not converting:
+            continue
+        while True:
+            current = _month_start(datetime.datetime.now(TARGET_TIMEZONE))
+            with engine.connect() as conn:
+                first = conn.execute(text(f"SELECT min({column}) FROM {_legacy_name(table)} WHERE {column} < :current"), {"current": current}).scalar()
+            if first is None:
+                break
+            _move_month(table, column, _month_start(first.astimezone(TARGET_TIMEZONE)))
+        _drop_legacy(table)
+
+# --- Retention: archive and drop partitions older than PARTITION_RETENTION_MONTHS ---
+def _export_partition(conn, partition, path):
+    result = conn.execution_options(stream_results=True, yield_per=5000).execute(text(f"SELECT * FROM {partition} ORDER BY id"))
+    rows = 0
+    with gzip.open(path + ".tmp", "wt", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(result.keys())
+        for partition_rows in result.partitions():
+            writer.writerows(partition_rows)
+            rows += len(partition_rows)
+    os.replace(path + ".tmp", path)
+    return rows
+
+def archive_old_partitions(keep_months=PARTITION_RETENTION_MONTHS, archive_dir=ARCHIVE_DIR):
+    if not enabled() or keep_months <= 0:
+        return []
+    cutoff = _add_months(_month_start(datetime.datetime.now(TARGET_TIMEZONE)), -keep_months)
+    os.makedirs(archive_dir, exist_ok=True)
+    archived = []
+    for table in PARTITIONED_TABLES:
+        pattern = re.compile(rf"^{table.name}_y(\d{{4}})m(\d{{2}})$")
+        with engine.connect() as conn:
+            partitions = conn.execute(text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(:name) ORDER BY c.relname"
+            ), {"name": table.name}).scalars().all()
+        for partition in partitions:
+            match = pattern.match(partition)
+            if not match:
+                continue
+            month = datetime.datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=TARGET_TIMEZONE)
+            if _add_months(month, 1) > cutoff:
+                continue
+            path = os.path.join(archive_dir, f"{partition}.csv.gz")
+            with engine.connect() as conn:
+                rows = _export_partition(conn, partition, path)
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table.name} DETACH PARTITION {partition}"))
+                conn.execute(text(f"DROP TABLE {partition}"))
+            archived.append(path)
+            _log(f"archived {partition} ({rows} rows) to {path}")
+    return archived
+
+def run_maintenance():
+    ensure_partitions()
+    return archive_old_partitions()
+
+def _maintenance_loop(stop):
+    while True:
+        try:
+            run_maintenance()
+        except Exception as ex:
+            _log(f"maintenance failed: {ex}")
+        if stop.wait(MAINTENANCE_INTERVAL_SECONDS):
+            return
+
+def start_maintenance():
+    stop = threading.Event()
+    if enabled():
+        threading.Thread(target=_maintenance_loop, args=(stop,), name="partition-maintenance", daemon=True).start()
+    return stop
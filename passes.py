@@ -0,0 +1,121 @@
+import base64
+import functools
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from config import PASS_CACHE_SIZE, PASS_BATCH_WORKERS
+from metrics import timer, STAGE_SECONDS
+
+# --- Layout of the pass, positions in inches from the bottom left corner ---
+TITLE = ("Helvetica", 16, 1, 10.5, "Guest pass")
+BODY_FONT = ("Helvetica", 12)
+FIELD_ROWS = (
+    (9.5, "Name: {name} {surname}"),
+    (9.2, "Company: {company}"),
+    (8.9, "Host: {host}"),
+    (8.6, "Date of visit: {date}"),
+    (8.3, "Number of visitors: {visitors}"),
+)
+QR_BOX = (1, 4, 3, 3)
+FOOTER_ROWS = (
+    (2.5, "Company Name"),
+    (2.2, "Company Adress"),
+    (1.9, "Company Adress2"),
+    (1.6, "Opening Hours:"),
+)
+
+# qrcode and reportlab are imported on first use, not with the module
+@functools.lru_cache(maxsize=PASS_CACHE_SIZE)
+def qr_png(qr_id):
+    import qrcode
+
+    buffer = io.BytesIO()
+    qrcode.make(qr_id).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def qr_base64(qr_id):
+    return base64.b64encode(qr_png(qr_id)).decode("utf-8")
+
+def _pass_key(data):
+    return (data["qr_id"], data["name"], data["surname"], data["company"], data["host"], str(data["date"]), str(data["visitors"]))
+
+def _render(data):
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.units import inch
+    from reportlab.lib.utils import ImageReader
+
+    pdf_buffer = io.BytesIO()
+    c = canvas.Canvas(pdf_buffer)
+    font, size, x, y, text = TITLE
+    c.setFont(font, size)
+    c.drawString(x*inch, y*inch, text)
+    c.setFont(*BODY_FONT)
+    for y, template in FIELD_ROWS:
+        c.drawString(1*inch, y*inch, template.format(**data))
+    x, y, width, height = QR_BOX
+    c.drawImage(ImageReader(io.BytesIO(qr_png(data["qr_id"]))), x*inch, y*inch, width=width*inch, height=height*inch)
+    for y, text in FOOTER_ROWS:
+        c.drawString(1*inch, y*inch, text)
+    c.showPage()
+    c.save()
+    return pdf_buffer.getvalue()
+
+# --- Rendered passes, keyed by qr_id ---
+class PassCache:
+    def __init__(self, size=PASS_CACHE_SIZE):
+        self.size = size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, data):
+        key = _pass_key(data)
+        with self.lock:
+            cached = self.items.get(key[0])
+            if cached and cached[0] == key:
+                self.items.move_to_end(key[0])
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+        return None
+
+    def put(self, data, pdf):
+        key = _pass_key(data)
+        with self.lock:
+            self.items[key[0]] = (key, pdf)
+            self.items.move_to_end(key[0])
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+pass_cache = PassCache()
+
+def render_pass_pdf(data):
+    pdf = pass_cache.get(data)
+    if pdf is None:
+        with timer(STAGE_SECONDS, stage="pdf_render"):
+            pdf = _render(data)
+        pass_cache.put(data, pdf)
+    return pdf
+
+# A group is rendered across processes, too few missing passes are not worth starting them
+def render_passes(items, workers=PASS_BATCH_WORKERS):
+    items = list(items)
+    results = [pass_cache.get(data) for data in items]
+    missing = [i for i, pdf in enumerate(results) if pdf is None]
+    with timer(STAGE_SECONDS, stage="pdf_render_batch"):
+        if workers <= 1 or len(missing) < 2 * workers:
+            rendered = [_render(items[i]) for i in missing]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                rendered = list(pool.map(_render, [items[i] for i in missing], chunksize=max(1, len(missing) // (workers * 4))))
+    for i, pdf in zip(missing, rendered):
+        pass_cache.put(items[i], pdf)
+        results[i] = pdf
+    return results
@@ -0,0 +1,249 @@
+import csv
+import datetime
+import hashlib
+import hmac
+import importlib.util
+import io
+import os
+import secrets
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from sqlalchemy import create_engine, Column, Date, DateTime, Float, Integer, String, select, func, delete, insert, literal, union_all
+
+from config import TARGET_TIMEZONE, REPORTS_DATABASE_URL, EXPORT_CHUNK_ROWS, ROLLUP_INTERVAL_SECONDS, EXPORT_LINK_SECRET, EXPORT_LINK_SECONDS
+from database import Base, engine, Registered, CheckIn, CheckOut, AccessCard
+
+# Exports read from a replica when one is configured, rollups are always written to the primary
+report_engine = create_engine(REPORTS_DATABASE_URL) if REPORTS_DATABASE_URL else engine
+
+def _log(message):
+    print(f"[reports] {message}", flush=True)
+
+# --- Daily rollup per host and company ---
+class DailyRollup(Base):
+    __tablename__ = "daily_rollups"
+    day = Column(Date, primary_key=True)
+    host = Column(String, primary_key=True)
+    company_name = Column(String, primary_key=True)
+    visits = Column(Integer, nullable=False)
+    visitors = Column(Integer, nullable=False)
+    dwell_visits = Column(Integer, nullable=False)
+    dwell_seconds = Column(Float, nullable=False)
+
+def _bounds(start, end):
+    low = datetime.datetime.combine(start, datetime.time(), tzinfo=TARGET_TIMEZONE)
+    high = datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time(), tzinfo=TARGET_TIMEZONE)
+    return low, high
+
+def _local_date(value):
+    return value.astimezone(TARGET_TIMEZONE).date() if value.tzinfo else value.date()
+
+def _visit_times(low, high):
+    first_in = (
+        select(CheckIn.qr_id, func.min(CheckIn.check_in_time).label("first_in"))
+        .where(CheckIn.check_in_time >= low, CheckIn.check_in_time < high)
+        .group_by(CheckIn.qr_id)
+        .subquery()
+    )
+    last_out = (
+        select(CheckOut.qr_id, func.max(CheckOut.check_out_time).label("last_out"))
+        .where(CheckOut.check_out_time >= low, CheckOut.check_out_time < high)
+        .group_by(CheckOut.qr_id)
+        .subquery()
+    )
+    return first_in, last_out
+
+def rollup_day(conn, day):
+    first_in, last_out = _visit_times(*_bounds(day, day))
+    rows = conn.execute(
+        select(Registered.host, Registered.company_name, Registered.visitors_count, first_in.c.first_in, last_out.c.last_out)
+        .join(first_in, first_in.c.qr_id == Registered.qr_id)
+        .outerjoin(last_out, last_out.c.qr_id == Registered.qr_id)
+    ).all()
+
+    totals = defaultdict(lambda: [0, 0, 0, 0.0])
+    for row in rows:
+        total = totals[(row.host, row.company_name or "")]
+        total[0] += 1
+        total[1] += row.visitors_count
+        if row.last_out is not None and row.last_out > row.first_in:
+            total[2] += 1
+            total[3] += (row.last_out - row.first_in).total_seconds()
+
+    conn.execute(delete(DailyRollup).where(DailyRollup.day == day))
+    if totals:
+        conn.execute(insert(DailyRollup), [
+            {"day": day, "host": host, "company_name": company, "visits": visits, "visitors": visitors, "dwell_visits": dwell_visits, "dwell_seconds": dwell_seconds}
+            for (host, company), (visits, visitors, dwell_visits, dwell_seconds) in totals.items()
+        ])
+    return len(rows)
+
+# Recomputes from the last rolled-up day, so late check-outs of that day are picked up
+def update_rollups():
+    with engine.connect() as conn:
+        day = conn.execute(select(func.max(DailyRollup.day))).scalar()
+        if day is None:
+            first = conn.execute(select(func.min(CheckIn.check_in_time))).scalar()
+            if first is None:
+                return 0
+            day = _local_date(first)
+    today = datetime.datetime.now(TARGET_TIMEZONE).date()
+    days = 0
+    while day <= today:
+        with engine.begin() as conn:
+            rollup_day(conn, day)
+        day += datetime.timedelta(days=1)
+        days += 1
+    return days
+
+def _rollup_loop(stop):
+    while True:
+        try:
+            update_rollups()
+        except Exception as ex:
+            _log(f"rollup failed: {ex}")
+        if stop.wait(ROLLUP_INTERVAL_SECONDS):
+            return
+
+def start_rollups():
+    stop = threading.Event()
+    threading.Thread(target=_rollup_loop, args=(stop,), name="report-rollups", daemon=True).start()
+    return stop
+
+# --- Exports ---
+def visits_query(start, end):
+    first_in, last_out = _visit_times(*_bounds(start, end))
+    return (
+        select(
+            Registered.visit_date, Registered.name, Registered.surname, Registered.company_name, Registered.host,
+            Registered.visitors_count, Registered.registration_time, first_in.c.first_in.label("check_in_time"),
+            last_out.c.last_out.label("check_out_time"),
+        )
+        .outerjoin(first_in, first_in.c.qr_id == Registered.qr_id)
+        .outerjoin(last_out, last_out.c.qr_id == Registered.qr_id)
+        .where(Registered.visit_date >= start, Registered.visit_date <= end)
+        .order_by(Registered.visit_date, Registered.id)
+    )
+
+def occupancy_query(start, end):
+    low, high = _bounds(start, end)
+    events = union_all(
+        select(CheckIn.check_in_time.label("time"), literal("in").label("event"), CheckIn.qr_id)
+        .where(CheckIn.check_in_time >= low, CheckIn.check_in_time < high),
+        select(CheckOut.check_out_time.label("time"), literal("out").label("event"), CheckOut.qr_id)
+        .where(CheckOut.check_out_time >= low, CheckOut.check_out_time < high),
+    ).subquery()
+    return (
+        select(events.c.time, events.c.event, events.c.qr_id, Registered.name, Registered.surname, Registered.company_name, Registered.host, Registered.visitors_count)
+        .outerjoin(Registered, Registered.qr_id == events.c.qr_id)
+        .order_by(events.c.time)
+    )
+
+def cards_query(start, end):
+    low, high = _bounds(start, end)
+    return (
+        select(AccessCard.issue_time, AccessCard.card_number, AccessCard.phone_number, AccessCard.qr_id, Registered.name, Registered.surname, Registered.company_name)
+        .outerjoin(Registered, Registered.qr_id == AccessCard.qr_id)
+        .where(AccessCard.issue_time >= low, AccessCard.issue_time < high)
+        .order_by(AccessCard.issue_time)
+    )
+
+def daily_query(start, end):
+    return (
+        select(
+            DailyRollup.day, DailyRollup.host, DailyRollup.company_name, DailyRollup.visits, DailyRollup.visitors,
+            (DailyRollup.dwell_seconds / func.nullif(DailyRollup.dwell_visits, 0) / 60).label("avg_dwell_minutes"),
+        )
+        .where(DailyRollup.day >= start, DailyRollup.day <= end)
+        .order_by(DailyRollup.day, DailyRollup.host, DailyRollup.company_name)
+    )
+
+EXPORTS = {
+    "visits": visits_query,
+    "occupancy": occupancy_query,
+    "cards": cards_query,
+    "daily": daily_query,
+}
+EXPORT_FORMATS = ("csv", "parquet")
+
+# Parquet is only offered when pyarrow is installed; looked up without importing it
+def available_formats():
+    return [fmt for fmt in EXPORT_FORMATS if fmt != "parquet" or importlib.util.find_spec("pyarrow") is not None]
+
+# --- Download links for the Admin page: signed, expire after EXPORT_LINK_SECONDS ---
+_link_secret = (EXPORT_LINK_SECRET or secrets.token_hex(32)).encode()
+
+def _link_signature(name, fmt, start, end, expires):
+    return hmac.new(_link_secret, f"{name}.{fmt}:{start}:{end}:{expires}".encode(), hashlib.sha256).hexdigest()
+
+def export_link(name, fmt, start, end):
+    start, end, expires = start.isoformat(), end.isoformat(), int(time.time()) + EXPORT_LINK_SECONDS
+    return f"/exports/{name}.{fmt}?start={start}&end={end}&expires={expires}&signature={_link_signature(name, fmt, start, end, expires)}"
+
+def valid_export_link(name, fmt, start, end, expires, signature):
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, _link_signature(name, fmt, start, end, int(expires)))
+
+# Rows are fetched through a server-side cursor, one chunk at a time
+def stream(name, start, end, chunk_rows=EXPORT_CHUNK_ROWS):
+    query = EXPORTS[name](start, end)
+    with report_engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_rows).execute(query)
+        for rows in result.partitions():
+            yield rows
+
+def iter_csv(name, start, end, chunk_rows=EXPORT_CHUNK_ROWS):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(c.name for c in EXPORTS[name](start, end).selected_columns)
+    for rows in stream(name, start, end, chunk_rows):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+def _arrow_type(pa, sql_type):
+    if isinstance(sql_type, Integer):
+        return pa.int64()
+    if isinstance(sql_type, Float):
+        return pa.float64()
+    if isinstance(sql_type, DateTime):
+        return pa.timestamp("us", tz="UTC")
+    if isinstance(sql_type, Date):
+        return pa.date32()
+    return pa.string()
+
+def write_parquet(name, start, end, path, chunk_rows=EXPORT_CHUNK_ROWS):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export requires the pyarrow package, please choose CSV.")
+    schema = pa.schema([(c.name, _arrow_type(pa, c.type)) for c in EXPORTS[name](start, end).selected_columns])
+    rows_written = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in stream(name, start, end, chunk_rows):
+            writer.write_table(pa.Table.from_arrays([pa.array(values, type=field.type) for field, values in zip(schema, zip(*rows))], schema=schema))
+            rows_written += len(rows)
+        if not rows_written:
+            writer.write_table(schema.empty_table())
+    return rows_written
+
+def export_file(name, fmt, start, end, directory=None):
+    fd, path = tempfile.mkstemp(suffix=f".{fmt}", dir=directory)
+    os.close(fd)
+    try:
+        if fmt == "parquet":
+            write_parquet(name, start, end, path)
+        else:
+            with open(path, "wb") as f:
+                for chunk in iter_csv(name, start, end):
+                    f.write(chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
@@ -0,0 +1,131 @@
+import asyncio
+import contextvars
+import datetime
+from collections import namedtuple, defaultdict
+from sqlalchemy import insert
+
+from config import TARGET_TIMEZONE, SCAN_BATCH_MS, SCAN_BATCH_SIZE
+from database import AsyncSessionLocal, CheckIn, CheckOut
+from checkin_cache import today_index, today_date
+from occupancy import occupancy, Occupant
+from events import bus, CHECKED_IN, CHECKED_OUT
+from metrics import timer, STAGE_SECONDS
+import edge
+
+OK = "ok"
+NOT_FOUND = "not_found"
+WRONG_DATE = "wrong_date"
+
+ScanResult = namedtuple("ScanResult", "status visitor time")
+
+# --- Groups check-in/check-out inserts of concurrent scans into one transaction ---
+class BatchWriter:
+    def __init__(self, interval_ms=SCAN_BATCH_MS, max_rows=SCAN_BATCH_SIZE):
+        self.interval = interval_ms / 1000
+        self.max_rows = max_rows
+        self.loop = None
+        self.pending = []
+        self.batches = 0
+        self.rows = 0
+
+    def _start(self, loop):
+        self.loop = loop
+        self.pending = []
+        self.wakeup = asyncio.Event()
+        self.full = asyncio.Event()
+        # Own context, so flush queries are not counted against the handler that started the writer
+        self.task = loop.create_task(self._run(), context=contextvars.Context())
+
+    # Returns once the row is committed, so callers only report success for durable scans
+    async def write(self, model, row):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self._start(loop)
+        future = loop.create_future()
+        self.pending.append((model, row, future))
+        if len(self.pending) == 1:
+            self.wakeup.set()
+        if len(self.pending) >= self.max_rows:
+            self.full.set()
+        await future
+
+    async def _run(self):
+        while True:
+            await self.wakeup.wait()
+            try:
+                await asyncio.wait_for(self.full.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            batch, self.pending = self.pending, []
+            self.wakeup.clear()
+            self.full.clear()
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        rows = defaultdict(list)
+        for model, row, _ in batch:
+            rows[model].append(row)
+        try:
+            with timer(STAGE_SECONDS, stage="scan_batch_flush"):
+                async with AsyncSessionLocal() as db:
+                    for model, values in rows.items():
+                        await db.execute(insert(model), values)
+                    await db.commit()
+        except Exception as ex:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(ex)
+            return
+        self.batches += 1
+        self.rows += len(batch)
+        for _, _, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+    def stats(self):
+        return {"batches": self.batches, "rows": self.rows, "pending": len(self.pending)}
+
+writer = BatchWriter()
+
+# --- Scan rules shared by the reception page and the scanner API ---
+# In edge mode visitors come from the local replica and scans go to the local journal
+async def _lookup(qr_id):
+    if edge.replica is not None:
+        return edge.replica.lookup(qr_id)
+    return await today_index.alookup(qr_id)
+
+async def _record(kind, model, qr_id, time_column, at):
+    if edge.replica is not None:
+        await asyncio.to_thread(edge.replica.record, kind, qr_id, at)
+    else:
+        await writer.write(model, {"qr_id": qr_id, time_column: at})
+
+async def validate(qr_id):
+    visitor = await _lookup(qr_id)
+    if visitor is None:
+        return ScanResult(NOT_FOUND, None, None)
+    if visitor.visit_date != today_date():
+        return ScanResult(WRONG_DATE, visitor, None)
+    return ScanResult(OK, visitor, None)
+
+async def check_in(qr_id):
+    result = await validate(qr_id)
+    if result.status != OK:
+        return result
+    visitor = result.visitor
+    check_in_time = datetime.datetime.now(TARGET_TIMEZONE)
+    await _record(edge.CHECK_IN, CheckIn, qr_id, "check_in_time", check_in_time)
+    occupant = Occupant(qr_id, visitor.name, visitor.surname, visitor.company_name, visitor.host, visitor.visitors_count, check_in_time)
+    occupancy.check_in(occupant)
+    bus.publish(CHECKED_IN, **{**occupant._asdict(), "check_in_time": check_in_time.isoformat()})
+    return ScanResult(OK, visitor, check_in_time)
+
+async def check_out(qr_id):
+    visitor = await _lookup(qr_id)
+    if visitor is None:
+        return ScanResult(NOT_FOUND, None, None)
+    check_out_time = datetime.datetime.now(TARGET_TIMEZONE)
+    await _record(edge.CHECK_OUT, CheckOut, qr_id, "check_out_time", check_out_time)
+    occupancy.check_out(qr_id)
+    bus.publish(CHECKED_OUT, qr_id=qr_id)
+    return ScanResult(OK, visitor, check_out_time)
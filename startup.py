@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+from sqlalchemy import text
+
+from config import STARTUP_SCHEMA, STARTUP_RETRY_SECONDS, STARTUP_RETRY_MAX_SECONDS, STARTUP_PROBE_TIMEOUT, STARTUP_TIMEOUT_SECONDS
+from database import Base, engine, async_engine
+from migrate import upgrade
+import partitions
+# Imported for their tables: create_all only knows models whose modules are loaded
+import mailer
+import reports
+
+WAITING_FOR_DATABASE = "waiting_for_database"
+PREPARING_SCHEMA = "preparing_schema"
+STARTING_SERVICES = "starting_services"
+READY = "ready"
+FAILED = "failed"
+
+def _log(message):
+    print(f"[startup] {message}", flush=True)
+
+# --- Tables, partitions and migrations; `python3 startup.py` runs them as a step of their own ---
+def prepare_schema():
+    partitions.create_partitioned_tables()
+    Base.metadata.create_all(bind=engine)
+    upgrade()
+
+# --- Runs after the web server is up: probe the database with backoff, prepare the schema, start services ---
+class Startup:
+    def __init__(self):
+        self.phase = WAITING_FOR_DATABASE
+        self.error = None
+        self.attempts = 0
+        self.started = time.monotonic()
+        self.ready_seconds = None
+        self.ready = threading.Event()
+        self.services = []
+        self.task = None
+
+    # Called in order on a worker thread once the schema is in place; usable as a decorator
+    def add(self, start_service):
+        self.services.append(start_service)
+        return start_service
+
+    async def _probe(self):
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def wait_for_database(self):
+        delay = STARTUP_RETRY_SECONDS
+        while True:
+            self.attempts += 1
+            try:
+                await asyncio.wait_for(self._probe(), STARTUP_PROBE_TIMEOUT)
+                self.error = None
+                return
+            except Exception as ex:
+                self.error = f"{type(ex).__name__}: {ex}"
+                if STARTUP_TIMEOUT_SECONDS and time.monotonic() - self.started + delay > STARTUP_TIMEOUT_SECONDS:
+                    raise
+            _log(f"database not reachable ({self.error}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, STARTUP_RETRY_MAX_SECONDS)
+
+    async def run(self):
+        try:
+            await self.wait_for_database()
+            if STARTUP_SCHEMA:
+                self.phase = PREPARING_SCHEMA
+                await asyncio.to_thread(prepare_schema)
+            self.phase = STARTING_SERVICES
+            for start_service in self.services:
+                await asyncio.to_thread(start_service)
+        except Exception as ex:
+            self.error = f"{type(ex).__name__}: {ex}"
+            _log(f"{self.phase} failed: {self.error}")
+            self.phase = FAILED
+            return
+        self.phase = READY
+        self.ready_seconds = time.monotonic() - self.started
+        self.ready.set()
+        _log(f"ready after {self.ready_seconds:.2f}s ({self.attempts} database probes)")
+
+    # Server startup hook: schedules the work and returns, so requests are answered meanwhile
+    def begin(self):
+        self.started = time.monotonic()
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    # True once ready, False if startup failed
+    async def wait(self, poll_seconds=0.2):
+        while not self.ready.is_set():
+            if self.phase == FAILED:
+                return False
+            await asyncio.sleep(poll_seconds)
+        return True
+
+    def health(self):
+        return {
+            "status": self.phase,
+            "uptime_seconds": round(time.monotonic() - self.started, 3),
+            "ready_after_seconds": None if self.ready_seconds is None else round(self.ready_seconds, 3),
+            "database_probes": self.attempts,
+            "error": self.error,
+        }
+
+startup = Startup()
+
+if __name__ == "__main__":
+    async def wait_for_database():
+        await startup.wait_for_database()
+        await async_engine.dispose()
+
+    asyncio.run(wait_for_database())
+    prepare_schema()
+    _log("schema ready")
@@ -0,0 +1,88 @@
+from collections import namedtuple
+from sqlalchemy import select, func, and_, or_, literal
+
+from config import LOG_PAGE_SIZE, LOG_WINDOW_PAGES
+from database import async_engine, AsyncSessionLocal, Registered, CheckIn, CheckOut
+
+LogEntry = namedtuple("LogEntry", "id registration_time visit_date name surname company_name host visitors_count check_in_time check_out_time")
+
+SEARCH_COLUMNS = (Registered.name, Registered.surname, Registered.company_name, Registered.host)
+
+def _term_filter(term, dialect):
+    # PostgreSQL: substring and fuzzy match, both served by the pg_trgm GIN indexes
+    if dialect == "postgresql":
+        return or_(*(or_(c.icontains(term, autoescape=True), literal(term).op("<%")(c)) for c in SEARCH_COLUMNS))
+    return or_(*(c.istartswith(term, autoescape=True) for c in SEARCH_COLUMNS))
+
+def log_query(search="", after=None, before=None, limit=LOG_PAGE_SIZE, dialect=None):
+    last_in = select(func.max(CheckIn.check_in_time)).where(CheckIn.qr_id == Registered.qr_id).scalar_subquery()
+    last_out = select(func.max(CheckOut.check_out_time)).where(CheckOut.qr_id == Registered.qr_id).scalar_subquery()
+    query = select(
+        Registered.id, Registered.registration_time, Registered.visit_date, Registered.name, Registered.surname,
+        Registered.company_name, Registered.host, Registered.visitors_count, last_in, last_out,
+    )
+    for term in search.split():
+        query = query.where(_term_filter(term, dialect or async_engine.dialect.name))
+
+    # Keyset pagination on (registration_time, id), newest first
+    if after is not None:
+        time, row_id = after
+        query = query.where(or_(Registered.registration_time < time, and_(Registered.registration_time == time, Registered.id < row_id)))
+        return query.order_by(Registered.registration_time.desc(), Registered.id.desc()).limit(limit)
+    if before is not None:
+        time, row_id = before
+        query = query.where(or_(Registered.registration_time > time, and_(Registered.registration_time == time, Registered.id > row_id)))
+        return query.order_by(Registered.registration_time.asc(), Registered.id.asc()).limit(limit)
+    return query.order_by(Registered.registration_time.desc(), Registered.id.desc()).limit(limit)
+
+async def fetch_page(search="", after=None, before=None, limit=LOG_PAGE_SIZE):
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(log_query(search, after, before, limit))).all()
+    entries = [LogEntry(*row) for row in rows]
+    return entries[::-1] if before is not None else entries
+
+def _key(entry):
+    return entry.registration_time, entry.id
+
+# --- Sliding window over the log: at most LOG_WINDOW_PAGES pages are kept per session ---
+class LogWindow:
+    def __init__(self, page_size=LOG_PAGE_SIZE, max_pages=LOG_WINDOW_PAGES):
+        self.page_size = page_size
+        self.max_rows = page_size * max_pages
+        self.search = ""
+        self.rows = []
+        self.at_start = True
+        self.at_end = False
+
+    async def reset(self, search=""):
+        self.search = search.strip()
+        self.rows = await fetch_page(self.search, limit=self.page_size)
+        self.at_start = True
+        self.at_end = len(self.rows) < self.page_size
+        return self.rows
+
+    # Returns (appended rows, number of rows dropped from the top)
+    async def next(self):
+        if self.at_end or not self.rows:
+            return [], 0
+        rows = await fetch_page(self.search, after=_key(self.rows[-1]), limit=self.page_size)
+        self.at_end = len(rows) < self.page_size
+        self.rows.extend(rows)
+        dropped = max(0, len(self.rows) - self.max_rows)
+        if dropped:
+            del self.rows[:dropped]
+            self.at_start = False
+        return rows, dropped
+
+    # Returns (prepended rows, number of rows dropped from the bottom)
+    async def previous(self):
+        if self.at_start or not self.rows:
+            return [], 0
+        rows = await fetch_page(self.search, before=_key(self.rows[0]), limit=self.page_size)
+        self.at_start = len(rows) < self.page_size
+        self.rows[:0] = rows
+        dropped = max(0, len(self.rows) - self.max_rows)
+        if dropped:
+            del self.rows[-dropped:]
+            self.at_end = False
+        return rows, dropped
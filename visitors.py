@@ -0,0 +1,102 @@
+import asyncio
+import datetime
+from collections import namedtuple
+from sqlalchemy import select, update
+
+from config import TARGET_TIMEZONE, DATE_FORMAT
+from database import AsyncSessionLocal, Registered, AccessCard
+from checkin_cache import today_index
+from occupancy import occupancy
+from events import bus, REGISTERED, VISITORS_IMPORTED, VISITORS_UPDATED, CARD_ISSUED
+from importer import import_visitors
+from mailer import mailer
+from passes import qr_base64
+from metrics import timer, STAGE_SECONDS
+import scans
+
+Card = namedtuple("Card", "qr_id phone_number card_number issue_time")
+
+# --- Visitor operations shared by every page, the scanner API, background workers and the benchmarks ---
+# Holds no state of its own: caches (today's index, rendered passes), connection pools, the scan
+# batch writer and the mail workers are process-wide, so every session uses the same ones
+class VisitorService:
+    # --- Registration ---
+    async def register(self, visitor):
+        async with AsyncSessionLocal() as db:
+            row = Registered(**visitor._asdict())
+            db.add(row)
+            await db.commit()
+        today_index.add(visitor, row.id)
+        bus.publish(REGISTERED, **{**visitor._asdict(), "visit_date": visitor.visit_date.isoformat()})
+        return visitor
+
+    # False when the visitor does not exist
+    async def update_count(self, qr_id, visitors_count):
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(update(Registered).where(Registered.qr_id == qr_id).values(visitors_count=visitors_count))
+            await db.commit()
+        if not result.rowcount:
+            return False
+        today_index.update_count(qr_id, visitors_count)
+        occupancy.update_count(qr_id, visitors_count)
+        bus.publish(VISITORS_UPDATED, qr_id=qr_id, visitors_count=visitors_count)
+        return True
+
+    def import_file(self, path, send_emails=True):
+        result = import_visitors(path, send_emails=send_emails)
+        today_index.refresh()
+        bus.publish(VISITORS_IMPORTED, count=result["imported"])
+        return result
+
+    # --- Scans ---
+    async def validate(self, qr_id):
+        return await scans.validate(qr_id)
+
+    async def check_in(self, qr_id):
+        return await scans.check_in(qr_id)
+
+    async def check_out(self, qr_id):
+        return await scans.check_out(qr_id)
+
+    # --- Access cards ---
+    # None when the QR code is unknown
+    async def issue_card(self, qr_id, phone_number, card_number):
+        if not await today_index.alookup(qr_id):
+            return None
+        card = Card(qr_id, phone_number, card_number, datetime.datetime.now(TARGET_TIMEZONE))
+        async with AsyncSessionLocal() as db:
+            db.add(AccessCard(**card._asdict()))
+            await db.commit()
+        bus.publish(CARD_ISSUED, **{**card._asdict(), "issue_time": card.issue_time.isoformat()})
+        return card
+
+    async def todays_cards(self):
+        today_start = datetime.datetime.now(TARGET_TIMEZONE).replace(hour=0, minute=0, second=0, microsecond=0)
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(
+                select(AccessCard.qr_id, AccessCard.phone_number, AccessCard.card_number, AccessCard.issue_time)
+                .where(AccessCard.issue_time >= today_start).order_by(AccessCard.issue_time.desc())
+            )).all()
+
+    # --- Guest passes ---
+    # Fields as rendered by passes.render_pass_pdf and queued by mailer.enqueue
+    @staticmethod
+    def pass_data(visitor):
+        return {
+            "qr_id": visitor.qr_id, "name": visitor.name, "surname": visitor.surname, "company": visitor.company_name,
+            "visitors": visitor.visitors_count, "host": visitor.host, "date": visitor.visit_date.strftime(DATE_FORMAT),
+        }
+
+    # Base64 PNG, rendered once per qr_id and process
+    async def qr_image(self, qr_id):
+        with timer(STAGE_SECONDS, stage="qr_encode"):
+            return await asyncio.to_thread(qr_base64, qr_id)
+
+    # Queues the pass with the visitor's current data; None when the QR code is unknown
+    def send_pass(self, recipient, qr_id, on_status=None):
+        visitor = today_index.lookup(qr_id)
+        if visitor is None:
+            return None
+        return mailer.enqueue(recipient, self.pass_data(visitor), on_status=on_status)
+
+service = VisitorService()
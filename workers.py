@@ -0,0 +1,194 @@
+import asyncio
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+from config import WORKERS, WORKER_BASE_PORT, SERVER_HOST, SERVER_PORT, EVENT_BUS_BACKEND, EVENT_SOCKET
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+COOKIE = "visitors_worker"
+COOKIE_PATTERN = re.compile(rb"visitors_worker=(\d+)")
+HEAD_TIMEOUT_SECONDS = 30
+CONNECT_TIMEOUT_SECONDS = 30  # how long a request waits for a worker while none is up
+DOWN_SECONDS = 1  # a worker that refused a connection is skipped for this long
+RESTART_SECONDS = 1
+HUB_MAX_BUFFER_BYTES = 16 * 1024 * 1024  # a worker this far behind on events is disconnected and resyncs on reconnect
+
+def _log(message):
+    print(f"[workers] {message}", flush=True)
+
+# --- Worker side: pins the browser to the process holding its Flet session ---
+# Plain ASGI middleware, so it stays out of the way of the websocket and streamed responses
+class StickyCookie:
+    def __init__(self, app, worker_id):
+        self.app = app
+        self.value = f"{COOKIE}={worker_id}".encode()
+        self.header = (b"set-cookie", self.value + b"; Path=/; HttpOnly; SameSite=Lax")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or any(name == b"cookie" and self.value in value for name, value in scope["headers"]):
+            return await self.app(scope, receive, send)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), self.header]
+            await send(message)
+        await self.app(scope, receive, send_with_cookie)
+
+# --- Balancer: requests with the cookie go back to their worker, the rest to the least busy one ---
+# The first request head of a connection picks the worker, the connection then stays with it,
+# which keeps a websocket and the HTTP requests of the same page on one process
+class Balancer:
+    def __init__(self, ports):
+        self.ports = ports
+        self.active = [0] * len(ports)
+        self.down_until = [0.0] * len(ports)
+
+    def _choose(self, head):
+        now = time.monotonic()
+        match = COOKIE_PATTERN.search(head)
+        if match and int(match.group(1)) < len(self.ports) and self.down_until[int(match.group(1))] <= now:
+            return int(match.group(1))
+        up = [i for i in range(len(self.ports)) if self.down_until[i] <= now]
+        return min(up, key=self.active.__getitem__) if up else None
+
+    async def _connect(self, head):
+        deadline = time.monotonic() + CONNECT_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            worker = self._choose(head)
+            if worker is None:
+                await asyncio.sleep(0.1)
+                continue
+            try:
+                return worker, *await asyncio.open_connection("127.0.0.1", self.ports[worker])
+            except OSError:
+                self.down_until[worker] = time.monotonic() + DOWN_SECONDS
+        return None, None, None
+
+    async def _pipe(self, reader, writer):
+        try:
+            while data := await reader.read(65536):
+                writer.write(data)
+                await writer.drain()
+            if writer.can_write_eof():
+                writer.write_eof()
+        except (ConnectionError, OSError):
+            writer.close()
+
+    async def handle(self, client_reader, client_writer):
+        try:
+            head = await asyncio.wait_for(client_reader.readuntil(b"\r\n\r\n"), HEAD_TIMEOUT_SECONDS)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+            client_writer.close()
+            return
+        worker, reader, writer = await self._connect(head)
+        if worker is None:
+            client_writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            client_writer.close()
+            return
+        self.active[worker] += 1
+        try:
+            writer.write(head)
+            await asyncio.gather(self._pipe(client_reader, writer), self._pipe(reader, client_writer))
+        finally:
+            self.active[worker] -= 1
+            writer.close()
+            client_writer.close()
+
+# --- Event hub for EVENT_BUS_BACKEND=unix: every line from one worker goes to all the others ---
+# Writes are buffered by the transport; a worker that stops reading is dropped instead of awaited,
+# so it cannot hold up the others
+class EventHub:
+    def __init__(self):
+        self.clients = set()
+
+    def _drop(self, client):
+        _log("dropping an event hub client that stopped reading")
+        self.clients.discard(client)
+        client.close()
+
+    async def handle(self, reader, writer):
+        self.clients.add(writer)
+        try:
+            while line := await reader.readline():
+                for client in list(self.clients):
+                    if client is not writer:
+                        client.write(line)
+                        if client.transport.get_write_buffer_size() > HUB_MAX_BUFFER_BYTES:
+                            self._drop(client)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+# --- Supervisor: worker 0 prepares the schema and runs the background jobs, the others start once it is ready ---
+def worker_env(worker):
+    env = dict(os.environ, WORKER_ID=str(worker), SERVER_HOST="127.0.0.1", SERVER_PORT=str(WORKER_BASE_PORT + worker))
+    if EVENT_BUS_BACKEND != "postgres":
+        env.update(EVENT_BUS_BACKEND="unix", EVENT_SOCKET=EVENT_SOCKET)
+    if worker:
+        env.update(STARTUP_SCHEMA="0", BACKGROUND_JOBS="0")
+    return env
+
+def healthy(worker):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{WORKER_BASE_PORT + worker}/health", timeout=2) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+class Supervisor:
+    def __init__(self, count):
+        self.count = count
+        self.processes = [None] * count
+        self.stopping = asyncio.Event()
+
+    def spawn(self, worker):
+        self.processes[worker] = subprocess.Popen([sys.executable, "app.py"], cwd=ROOT, env=worker_env(worker))
+        _log(f"worker {worker} started on port {WORKER_BASE_PORT + worker} (pid {self.processes[worker].pid})")
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.stopping.set)
+        if os.path.exists(EVENT_SOCKET):
+            os.remove(EVENT_SOCKET)
+        hub = await asyncio.start_unix_server(EventHub().handle, EVENT_SOCKET)
+        balancer = await asyncio.start_server(Balancer([WORKER_BASE_PORT + i for i in range(self.count)]).handle, SERVER_HOST, SERVER_PORT)
+        _log(f"balancing {SERVER_HOST}:{SERVER_PORT} over {self.count} workers")
+
+        self.spawn(0)
+        waiting = list(range(1, self.count))
+        while not self.stopping.is_set():
+            if waiting and await asyncio.to_thread(healthy, 0):
+                for worker in waiting:
+                    self.spawn(worker)
+                waiting = []
+            for worker, process in enumerate(self.processes):
+                if process is not None and process.poll() is not None:
+                    _log(f"worker {worker} exited with {process.returncode}, restarting")
+                    self.spawn(worker)
+            try:
+                await asyncio.wait_for(self.stopping.wait(), RESTART_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+        balancer.close()
+        hub.close()
+        for process in self.processes:
+            if process is not None:
+                process.terminate()
+        for process in self.processes:
+            if process is not None:
+                process.wait()
+        if os.path.exists(EVENT_SOCKET):
+            os.remove(EVENT_SOCKET)
+        _log("stopped")
+
+if __name__ == "__main__":
+    asyncio.run(Supervisor(WORKERS or os.cpu_count() or 1).run())